@@ -1,19 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Request, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import Session
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from const import MEDIA_ASSETS, DOC_PATH, IMG_PATH, CREDENTIALS_EXCEPTION, ACCESS_TOKEN_EXPIRE_MINUTES
-from db.database import get_db
-from db.crud import create_book, save_file, get_all_books, get_book_image_path, delete_book, update_keys, get_model_by_path
+from db.database import get_db, get_async_db, get_db_engine, get_async_db_engine, pool_stats
+from db.crud import create_uploaded_books, stage_upload, get_book_by_path, get_existing_book_paths, get_book_or_404, get_book_file, delete_book, delete_books
+from db import async_crud
+from db.progress import progress_buffer
 from schemas.user import User
-from schemas.book import TextResponseModel, ChunkTextResponse, ChunkTextRequest
+from schemas.book import TextToSpeechRequest, TtsPositionRequest, ProgressUpdate, BulkDeleteRequest, BulkItemResult, TextResponseModel, ChunkTextResponse, ChunkTextRequest, IngestStatusResponse, PagesResponse, PageTextResponse
+from core.admission import admission, admit, admitted, admitted_stream, request_identity
+from core.hashing import password_hasher
+from core.principals import principal_cache
 from core.security import get_current_active_user, authenticate_user, create_access_token, register_user
-from utils.pdf_utils import extract_metadata, first_page_jpeg, make_path, pdf_to_text, delete_file, get_pages, chunk_text
+from utils.pdf_utils import read_upload_metadata, make_path, make_blob_path, pdf_to_text, page_text, delete_file, count_pages, pages_to_text, chunk_text, iter_text_chunks
+from utils.text_cache import page_text_cache
+from utils.ingest import ingestion
+from utils.reader_pool import reader_pool
+from utils.page_stream import page_streamer
+from utils.audio_cache import audio_cache
+from utils.tts import cached_audio, engine_name, get_engine, synthesize
+from utils.presynth import presynthesizer
+from utils.search import search_index
+from utils.http_cache import book_cache_headers, book_version, file_cache_headers, is_not_modified, not_modified
+from utils.metrics import register_collector, render as render_metrics
+from utils.covers import cover_renderer, cover_variant_path, placeholder, COVER_SIZES, COVER_FORMATS
+from const import INGEST_CHUNK_SIZE, BOOKS_PAGE_MAX, BATCH_PAGES_MAX, PRESYNTH_WAIT_SECONDS, SEARCH_RESULTS_MAX, BULK_MAX_FILES, BULK_WORKERS
 from schemas.user import Token, UserCreate, TtsModelUpdateRequest
 from datetime import timedelta
 from typing import List
+import asyncio
+import json
 import logging 
+import os
 
 
 logging.basicConfig(level=logging.INFO)
@@ -21,143 +44,545 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/tts_model", response_model=dict)
-def get_tts_model(db: Session = Depends(get_db), book_path: str = None):
-    keys = get_model_by_path(db, book_path)
+async def get_tts_model(db: AsyncSession = Depends(get_async_db), book_path: str = None):
+    keys = await async_crud.get_model_by_path(db, book_path)
     return keys
 
 @router.post("/update_tts_model", response_model=TextResponseModel)
-def update_tts_model(request: TtsModelUpdateRequest, db: Session = Depends(get_db)):
-    logger.info(f"Received request to update TTS model: path={request.path}, model_name={request.model_name}, model_keys={request.model_keys}")
+async def update_tts_model(request: TtsModelUpdateRequest, db: AsyncSession = Depends(get_async_db)):
+    logger.info("Received request to update TTS model: path=%s, model_name=%s", request.path, request.model_name)
     try:
-        result = update_keys(db, request.path, request.model_keys, request.model_name)
+        result = await async_crud.update_keys(db, request.path, request.model_keys, request.model_name)
         if result:
             logger.info("TTS model added successfully.")
             return {"text": "TTS model added successfully"}
         else:
-            logger.warning(f"No TTS model found for path: {request.path}, nothing updated.")
+            logger.warning("No TTS model found for path: %s, nothing updated.", request.path)
             raise HTTPException(status_code=404, detail="TTS model not found")
     except Exception as e:
-        logger.error(f"Error updating TTS model: {e}")
+        logger.error("Error updating TTS model: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
     
-@router.post("/chunk_text", response_model=ChunkTextResponse)
+async def resolve_tts_model(db: AsyncSession, path: str | None, model_name: str | None) -> tuple[str, dict | None]:
+    model_keys = None
+    if path:
+        model = await async_crud.get_model_by_path(db, path)
+        if model:
+            model_name = model_name or model["name"]
+            model_keys = model["keys"]
+    return engine_name(model_name), model_keys
+
+@router.post("/tts")
+async def text_to_speech(request: Request, tts_request: TextToSpeechRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Audio for one chunk of text. Cached segments are served from disk;
+    otherwise audio is streamed as the engine produces it and cached once complete.
+    """
+    if not tts_request.text.strip():
+        raise HTTPException(status_code=400, detail="Text is empty")
+    model_name, model_keys = await resolve_tts_model(db, tts_request.path, tts_request.model_name)
+    engine = get_engine(model_name)
+    voice = tts_request.voice_id
+    key, cached_path = cached_audio(tts_request.text, model_name, voice, model_keys)
+    if cached_path is None:
+        # Pre-synthesis may be producing this very chunk; finishing it beats starting over.
+        running = presynthesizer.running(tts_request.text, model_name, voice, model_keys)
+        if running is not None:
+            try:
+                await asyncio.wait_for(asyncio.wrap_future(running), PRESYNTH_WAIT_SECONDS)
+            except Exception:
+                pass
+            key, cached_path = cached_audio(tts_request.text, model_name, voice, model_keys)
+        if tts_request.path:
+            presynthesizer.record_playback(ready=False)
+    elif tts_request.path:
+        presynthesizer.record_playback(ready=True)
+    if cached_path:
+        return FileResponse(cached_path, media_type=engine.media_type, headers={"X-Audio-Cache": "hit"})
+    # A slot per piece of audio, not for the time the client takes to receive it.
+    audio = await run_in_threadpool(
+        admitted_stream, "interactive", request_identity(request),
+        synthesize(tts_request.text, model_name, voice, model_keys),
+    )
+    return StreamingResponse(audio, media_type=engine.media_type, headers={"X-Audio-Cache": "miss"})
+
+@router.post("/tts/position", response_model=dict, dependencies=[Depends(admit("ingest"), scope="function")])
+async def update_tts_position(
+    position: TtsPositionRequest,
+    user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Reports the listener's playback position so the chunks after it are synthesized ahead of time."""
+    book = await get_own_book(db, position.path, user)
+    await run_in_threadpool(progress_buffer.record, book.path, position.page)
+    model_name, model_keys = await resolve_tts_model(db, position.path, position.model_name)
+    scheduled = await run_in_threadpool(
+        presynthesizer.update, user.username, book.path, book.file_path, position.page, position.chunk,
+        model_name, position.voice_id, model_keys,
+    )
+    return {"scheduled": scheduled}
+
+@router.delete("/tts/position", response_model=TextResponseModel)
+async def stop_tts(user: User = Depends(get_current_active_user)):
+    presynthesizer.stop(user.username)
+    return {"text": "Stopped"}
+
+@router.post("/chunk_text", response_model=ChunkTextResponse, dependencies=[Depends(admit("ingest"), scope="function")])
 def chunk_text_endpoint(request: ChunkTextRequest):
     chunks = chunk_text(request.text, request.chunk_size)
     return ChunkTextResponse(chunks=chunks)
 
+@router.post("/chunk_text/stream")
+async def chunk_text_stream(request: Request, chunk_size: int = Query(3000, ge=1)):
+    """
+    Chunks a plain-text request body and streams the chunks back as NDJSON,
+    one `{"index": ..., "chunk": ...}` object per line, as soon as each is ready.
+    """
+    # The body is read up front: while a response streams, Starlette consumes
+    # the receive channel itself to watch for disconnects.
+    text = (await request.body()).decode("utf-8", errors="replace")
+
+    def lines():
+        for index, chunk in enumerate(iter_text_chunks(text, chunk_size)):
+            yield json.dumps({"index": index, "chunk": chunk}) + "\n"
+    stream = await run_in_threadpool(admitted_stream, "ingest", request_identity(request), lines())
+    return StreamingResponse(stream, media_type="application/x-ndjson")
+
 @router.post("/register", response_model=UserCreate)
-def register(user_create: UserCreate, db: Session = Depends(get_db)):
-    new_user = register_user(db, user_create)
+async def register(user_create: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    new_user = await register_user(db, user_create)
     return new_user
 
-@router.post("/text", response_model=TextResponseModel)
+@router.post("/text", response_model=TextResponseModel, dependencies=[Depends(admit("ingest"), scope="function")])
 def get_text(pdf_file: UploadFile = File(...)):
     if pdf_file.filename == '':
         raise HTTPException(status_code=400, detail="No selected file")
-    text = pdf_to_text(pdf_file.file.read())
+    text = pdf_to_text(pdf_file.file)
     return {"text": text}
 
-@router.get("/flip", response_model=TextResponseModel)
-def flip_page(path, page_num):
-    text = pdf_to_text(path, page_num)
-    return TextResponseModel(text=text)
+@router.get("/flip", response_model=PageTextResponse)
+def flip_page(path, page_num, request: Request, response: Response, v: str = None, db: Session = Depends(get_db)):
+    book = get_book_or_404(db, path)
+    headers = book_cache_headers(book, f"flip:{page_num}", v)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    response.headers.update(headers)
+    with admitted("interactive", request_identity(request)):
+        text, source = page_text(book.file_path, page_num)
+    return PageTextResponse(text=text, source=source)
+
+@router.get("/pages", response_model=PagesResponse)
+def get_pages_text(path, request: Request, response: Response, pages: List[int] = Query(None),
+                   start: int = Query(None, ge=0), count: int = Query(None, ge=1, le=BATCH_PAGES_MAX), v: str = None,
+                   db: Session = Depends(get_db)):
+    """Texts of several pages at once, given either as repeated `pages` or as `start` and `count`."""
+    if pages is None:
+        if start is None or count is None:
+            raise HTTPException(status_code=400, detail="Either pages or start and count are required")
+        pages = list(range(start, start + count))
+    if len(pages) > BATCH_PAGES_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_PAGES_MAX} pages per request")
+    pages = list(dict.fromkeys(pages))
+    book = get_book_or_404(db, path)
+    headers = book_cache_headers(book, f"pages:{','.join(map(str, pages))}", v)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    response.headers.update(headers)
+    with admitted("interactive", request_identity(request)):
+        texts = pages_to_text(book.file_path, pages)
+    return PagesResponse(pages=[
+        {"page": page_num, "text": texts[page_num][0], "source": texts[page_num][1]} for page_num in pages
+    ])
+
+@router.get("/db_pool_stats", response_model=dict)
+def db_pool_stats():
+    return {"sync": pool_stats(get_db_engine()), "async": pool_stats(get_async_db_engine().sync_engine)}
+
+@router.get("/cache_stats", response_model=dict)
+def cache_stats():
+    return {
+        "page_text": page_text_cache.stats(),
+        "readers": reader_pool.stats(),
+        "principals": principal_cache.stats(),
+        "audio": audio_cache.stats(),
+        "presynth": presynthesizer.stats(),
+        "progress": progress_buffer.stats(),
+    }
+
+def service_metrics():
+    caches = {
+        "page_text": page_text_cache.stats(),
+        "readers": reader_pool.stats(),
+        "principals": principal_cache.stats(),
+        "audio": audio_cache.stats(),
+    }
+    for cache, stats in caches.items():
+        hits = stats["hits"] + stats.get("disk_hits", 0)
+        lookups = hits + stats["misses"]
+        yield "cache_hits_total", "counter", "Cache lookups that were hits.", {"cache": cache}, hits
+        yield "cache_misses_total", "counter", "Cache lookups that were misses.", {"cache": cache}, stats["misses"]
+        yield "cache_hit_ratio", "gauge", "Share of cache lookups that were hits.", {"cache": cache}, hits / lookups if lookups else 0.0
+    for name, bind in (("sync", get_db_engine()), ("async", get_async_db_engine().sync_engine)):
+        pool = pool_stats(bind)
+        for stat in ("size", "checked_in", "checked_out", "overflow"):
+            if stat in pool:
+                yield f"db_pool_{stat}", "gauge", f"Database pool connections: {stat.replace('_', ' ')}.", {"engine": name}, pool[stat]
+    hasher = password_hasher.stats()
+    yield "bcrypt_pending", "gauge", "bcrypt operations running or queued.", {}, hasher["pending"]
+    yield "bcrypt_rejected_total", "counter", "Logins rejected because the bcrypt queue was full.", {}, hasher["rejected"]
+    admitted = admission.stats()
+    for priority in admitted["active"]:
+        yield "admission_active", "gauge", "Requests holding an admission slot.", {"priority": priority}, admitted["active"][priority]
+        yield "admission_queued", "gauge", "Requests waiting for an admission slot.", {"priority": priority}, admitted["queued"][priority]
+    progress = progress_buffer.stats()
+    yield "progress_pending", "gauge", "Reading positions waiting to be written.", {}, progress["pending"]
+
+register_collector(service_metrics)
+
+@router.get("/admission_stats", response_model=dict)
+async def admission_stats():
+    return admission.stats()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 @router.get("/get_image", response_class=FileResponse)
-def get_image(db: Session = Depends(get_db), book_path: str = None):   
-    image_path = get_book_image_path(db, book_path)
-    return FileResponse(image_path, media_type='image/jpeg')
+def get_image(request: Request, db: Session = Depends(get_db), book_path: str = None, size: str = "full", format: str = "jpeg", v: str = None):
+    if size not in COVER_SIZES:
+        raise HTTPException(status_code=400, detail=f"Size must be one of: {', '.join(COVER_SIZES)}")
+    if format not in COVER_FORMATS or (format == "webp" and not cover_renderer.webp):
+        raise HTTPException(status_code=400, detail="Unsupported image format")
+
+    book = get_book_or_404(db, book_path)
+    img_path = book.metadata_['img_path']
+    image_path = cover_variant_path(img_path, size, format)
+    if os.path.exists(image_path):
+        headers = file_cache_headers(image_path, immutable=v is not None and v == book_version(book))
+        if is_not_modified(request, headers):
+            return not_modified(headers)
+        return FileResponse(image_path, media_type=COVER_FORMATS[format], headers=headers)
+
+    # Not rendered yet (or rendered before this size existed): queue it.
+    cover_renderer.submit(book.file_path, img_path)
+    return Response(placeholder(size, format), media_type=COVER_FORMATS[format], headers={"Cache-Control": "no-store"})
     
 
 @router.get("/get_pages_num", response_model=TextResponseModel)
-def get_pages_num(path):
-    pages = get_pages(path)
-    return TextResponseModel(text=str(len(pages)))
+def get_pages_num(path, request: Request, response: Response, v: str = None, db: Session = Depends(get_db)):
+    book = get_book_or_404(db, path)
+    headers = book_cache_headers(book, "pages_num", v)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    response.headers.update(headers)
+    file_path = book.file_path
+    manifest = page_text_cache.get_artifact(file_path, "manifest")
+    if manifest:
+        return TextResponseModel(text=str(manifest["pages"]))
+    with admitted("interactive", request_identity(request)):
+        pages_num = count_pages(file_path)
+    return TextResponseModel(text=str(pages_num))
+
+@router.get("/ingest_status", response_model=IngestStatusResponse)
+def ingest_status(path: str, db: Session = Depends(get_db)):
+    status = ingestion.status(get_book_file(db, path))
+    if status is None:
+        raise HTTPException(status_code=404, detail="Book has not been ingested")
+    return IngestStatusResponse(**status)
+
+@router.get("/get_chunks", response_model=ChunkTextResponse)
+def get_chunks(request: Request, response: Response, path: str, page_num: int = 0, v: str = None, db: Session = Depends(get_db)):
+    book = get_book_or_404(db, path)
+    headers = book_cache_headers(book, f"chunks:{INGEST_CHUNK_SIZE}:{page_num}", v)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    response.headers.update(headers)
+    file_path = book.file_path
+    chunks = page_text_cache.get_artifact(file_path, "chunks")
+    if chunks and 0 <= page_num < len(chunks["pages"]):
+        return ChunkTextResponse(chunks=chunks["pages"][page_num])
+    with admitted("interactive", request_identity(request)):
+        text = pdf_to_text(file_path, page_num)
+        return ChunkTextResponse(chunks=chunk_text(text, INGEST_CHUNK_SIZE))
 
 @router.delete("/delete_book", response_model=TextResponseModel)
 def delete(db: Session = Depends(get_db), path: str = None):
-    logger.info(f"Received request to delete book with path: {path}")
+    logger.info("Received request to delete book with path: %s", path)
 
     try:
-        img_path = get_book_image_path(db, path)
-        logger.info(f"Image path for book: {img_path}")
-
-        if not delete_file(img_path):
-            logger.error(f"Failed to delete image file: {img_path}")
-            raise HTTPException(status_code=500, detail="Failed to delete image file")
-        
-        logger.info(f"Successfully deleted image file: {img_path}")
-
-        if not delete_book(db, path):
-            logger.error(f"Book not found in database: {path}")
+        orphaned = delete_book(db, path)
+        if orphaned is None:
+            logger.error("Book not found in database: %s", path)
             raise HTTPException(status_code=404, detail="Book not found")
         
-        logger.info(f"Successfully deleted book record from database: {path}")
+        logger.info("Successfully deleted book record from database: %s", path)
 
-        if not delete_file(path):
-            logger.error(f"Failed to delete book file: {path}")
-            raise HTTPException(status_code=500, detail="Failed to delete file")
-        
-        logger.info(f"Successfully deleted book file: {path}")
+        for file_path in orphaned:
+            if not delete_file(file_path):
+                logger.error("Failed to delete file: %s", file_path)
+                raise HTTPException(status_code=500, detail="Failed to delete file")
+            logger.info("Successfully deleted file: %s", file_path)
 
         return TextResponseModel(text="Book deleted successfully")
     except HTTPException as e:
-        logger.error(f"HTTP Exception: {e.detail}")
+        logger.error("HTTP Exception: %s", e.detail)
         raise e
     except Exception as e:
-        logger.error(f"An unexpected error occurred: {str(e)}")
+        logger.error("An unexpected error occurred: %s", e)
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
     
 @router.get("/books", response_model=List[dict])
-def get_books(db: Session = Depends(get_db), user: User = Depends(get_current_active_user)):
-    books = get_all_books(db, user.username)
-    return [{"metadata": book.metadata_, "path": book.path, "page": book.page_idx} for book in books]
+async def get_books(
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_active_user),
+    limit: int = Query(None, ge=1, le=BOOKS_PAGE_MAX),
+    cursor: str = None,
+    sort: str = "path",
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+):
+    books, next_cursor = await async_crud.get_books_page(db, user.username, limit, cursor, sort, descending=order == "desc")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [{"metadata": book.metadata_, "path": book.path, "page": book_page(book), "version": book.content_hash} for book in books]
+
+def book_page(book) -> int:
+    pending = progress_buffer.pending(book.path)
+    return book.page_idx if pending is None else pending
+
+async def get_own_book(db: AsyncSession, path: str, user: User):
+    book = await async_crud.get_book_or_404(db, path)
+    if book.owner != user.username:
+        raise HTTPException(status_code=404, detail="Book not found")
+    return book
 
-@router.get("/get_book", response_model=TextResponseModel)
-def get_book(path):
-    text = pdf_to_text(path)
-    return TextResponseModel(text=text)
+@router.get("/search", response_model=List[dict])
+async def search_books(
+    q: str,
+    user: User = Depends(get_current_active_user),
+    limit: int = Query(20, ge=1, le=SEARCH_RESULTS_MAX),
+    offset: int = Query(0, ge=0),
+):
+    """Pages of the current user's books matching all words of `q`, best matches first."""
+    return await run_in_threadpool(search_index.search, user.username, q, limit, offset)
+
+@router.put("/progress", response_model=dict)
+async def update_progress(
+    progress: ProgressUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_active_user),
+):
+    await get_own_book(db, progress.path, user)
+    # Writes through to the database when buffering is disabled.
+    await run_in_threadpool(progress_buffer.record, progress.path, progress.page_idx)
+    return {"path": progress.path, "page": progress.page_idx}
+
+@router.get("/progress", response_model=dict)
+async def get_progress(path: str, db: AsyncSession = Depends(get_async_db), user: User = Depends(get_current_active_user)):
+    book = await get_own_book(db, path, user)
+    return {"path": book.path, "page": book_page(book)}
+
+@router.get("/get_book", response_model=PageTextResponse)
+def get_book(path, request: Request, response: Response, v: str = None, db: Session = Depends(get_db)):
+    book = get_book_or_404(db, path)
+    headers = book_cache_headers(book, "flip:0", v)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    response.headers.update(headers)
+    with admitted("interactive", request_identity(request)):
+        text, source = page_text(book.file_path)
+    return PageTextResponse(text=text, source=source)
+
+@router.get("/stream_book")
+def stream_book(path, request: Request, start: int = Query(0, ge=0), end: int = Query(None, ge=0),
+                chunks: bool = False, v: str = None, db: Session = Depends(get_db)):
+    """
+    Streams the text of pages [start, end) as NDJSON, one
+    `{"page": ..., "text": ...}` object per line, plus the page's TTS chunks
+    when `chunks` is set.
+    """
+    book = get_book_or_404(db, path)
+    headers = book_cache_headers(book, f"stream:{start}:{end}:{chunks}", v)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    file_path = book.file_path
+    manifest = page_text_cache.get_artifact(file_path, "manifest")
+    user = request_identity(request)
+    if manifest:
+        pages_num = manifest["pages"]
+    else:
+        with admitted("interactive", user):
+            pages_num = count_pages(file_path)
+    end = pages_num if end is None else min(end, pages_num)
+    if start >= end and pages_num:
+        raise HTTPException(status_code=400, detail="Invalid page range")
+    chunked = page_text_cache.get_artifact(file_path, "chunks") if chunks else None
+
+    def lines():
+        for page_num, text, source in page_streamer.pages(file_path, start, end):
+            line = {"page": page_num, "text": text, "source": source}
+            if chunks:
+                if chunked and page_num < len(chunked["pages"]):
+                    line["chunks"] = chunked["pages"][page_num]
+                else:
+                    line["chunks"] = chunk_text(text, INGEST_CHUNK_SIZE)
+            yield json.dumps(line) + "\n"
+    # A slot per page, not for the time the client takes to read the whole book.
+    stream = admitted_stream("interactive", user, lines())
+    return StreamingResponse(stream, media_type="application/x-ndjson", headers=headers)
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(db: AsyncSession = Depends(get_async_db), form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise CREDENTIALS_EXCEPTION
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "role": user.role}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-@router.post("/add_book", response_model=TextResponseModel)
+@router.post("/add_book", response_model=TextResponseModel, dependencies=[Depends(admit("ingest"), scope="function")])
 def add_book_endpoint(
     db: Session = Depends(get_db), 
     pdf_file: UploadFile = File(...), 
     user: User = Depends(get_current_active_user)
 ):
     try:
-        doc_path = make_path(MEDIA_ASSETS + DOC_PATH, user.username, pdf_file.filename)
-        img_path = make_path(MEDIA_ASSETS + IMG_PATH, user.username, pdf_file.filename.replace('.pdf', '.jpeg'))
-
         if pdf_file.filename == '':
             raise HTTPException(status_code=400, detail="No selected file")
 
-        file_content = BytesIO(pdf_file.file.read())
-
-        if not save_file(file_content, doc_path):
+        doc_path = make_path(MEDIA_ASSETS + DOC_PATH, user.username, pdf_file.filename)
+        if get_book_by_path(db, doc_path):
             raise HTTPException(status_code=400, detail="File already exists")
 
-        metadata = extract_metadata(file_content)
-        metadata['img_path'] = img_path
-        create_book(db, doc_path, metadata)
-        
-        image = first_page_jpeg(doc_path)
-        
-        if not save_file(image, img_path):
-            raise HTTPException(status_code=500, detail="Failed to save image file")
+        tmp_path, sha256 = stage_upload(pdf_file.file, MEDIA_ASSETS + DOC_PATH)
+        try:
+            metadata = read_upload_metadata(tmp_path)
+            blob_path = make_blob_path(MEDIA_ASSETS + DOC_PATH, sha256, '.pdf')
+            img_path = make_blob_path(MEDIA_ASSETS + IMG_PATH, sha256, '.jpeg')
+            metadata['img_path'] = img_path
+            create_uploaded_books(db, [{
+                "path": doc_path, "metadata": metadata, "sha256": sha256, "tmp_path": tmp_path,
+                "blob_path": blob_path, "img_path": img_path, "size": os.path.getsize(tmp_path),
+            }], user.username)
+        except IntegrityError:
+            raise HTTPException(status_code=400, detail="File already exists")
+        finally:
+            os.unlink(tmp_path)
+        start_processing(user.username, doc_path, blob_path, img_path)
         
         return {"text": "Book added successfully"}
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
 
+def start_processing(username: str, doc_path: str, blob_path: str, img_path: str):
+    ingestion.submit(blob_path, on_done=lambda file_path: search_index.submit(username, doc_path, file_path))
+    if not os.path.exists(img_path):
+        cover_renderer.submit(blob_path, img_path)
+
+def stage_book(pdf_file: UploadFile, doc_path: str) -> dict:
+    """Stages and validates one upload; its `tmp_path` belongs to the caller unless this raises."""
+    tmp_path, sha256 = stage_upload(pdf_file.file, MEDIA_ASSETS + DOC_PATH)
+    try:
+        metadata = read_upload_metadata(tmp_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    img_path = make_blob_path(MEDIA_ASSETS + IMG_PATH, sha256, '.jpeg')
+    metadata['img_path'] = img_path
+    return {
+        "path": doc_path, "metadata": metadata, "sha256": sha256, "tmp_path": tmp_path,
+        "blob_path": make_blob_path(MEDIA_ASSETS + DOC_PATH, sha256, '.pdf'),
+        "img_path": img_path, "size": os.path.getsize(tmp_path),
+    }
+
+@router.post("/add_books", response_model=List[BulkItemResult], dependencies=[Depends(admit("ingest"), scope="function")])
+def add_books_endpoint(
+    db: Session = Depends(get_db),
+    pdf_files: List[UploadFile] = File(...),
+    user: User = Depends(get_current_active_user),
+):
+    """
+    Adds several books at once. Files are staged and hashed concurrently and
+    all new books are inserted in a single transaction; each file gets its own result.
+    """
+    if len(pdf_files) > BULK_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_FILES} files per request")
+    doc_paths = [make_path(MEDIA_ASSETS + DOC_PATH, user.username, pdf_file.filename) for pdf_file in pdf_files]
+    existing = get_existing_book_paths(db, doc_paths)
+    results = [BulkItemResult(path=doc_path, filename=pdf_file.filename, status="added")
+               for pdf_file, doc_path in zip(pdf_files, doc_paths)]
+    pending = []
+    for index, (pdf_file, doc_path) in enumerate(zip(pdf_files, doc_paths)):
+        if pdf_file.filename == '':
+            results[index].status, results[index].detail = "error", "No selected file"
+        elif doc_path in existing:
+            results[index].status, results[index].detail = "error", "File already exists"
+        else:
+            existing.add(doc_path)
+            pending.append(index)
+
+    uploads = []
+    staged = []
+    try:
+        with ThreadPoolExecutor(max_workers=BULK_WORKERS) as pool:
+            futures = [(index, pool.submit(stage_book, pdf_files[index], doc_paths[index])) for index in pending]
+            for index, future in futures:
+                try:
+                    upload = future.result()
+                except HTTPException as e:
+                    results[index].status, results[index].detail = "error", e.detail
+                    continue
+                except Exception as e:
+                    logger.error("Failed to stage %s: %s", pdf_files[index].filename, e)
+                    results[index].status, results[index].detail = "error", str(e)
+                    continue
+                staged.append(upload["tmp_path"])
+                uploads.append((index, upload))
+
+        try:
+            if uploads:
+                create_uploaded_books(db, [upload for _, upload in uploads], user.username)
+        except SQLAlchemyError:
+            # A concurrent upload conflicted with the batch: fall back to one transaction per book.
+            for index, upload in list(uploads):
+                try:
+                    create_uploaded_books(db, [upload], user.username)
+                except SQLAlchemyError:
+                    results[index].status, results[index].detail = "error", "File already exists"
+                    uploads.remove((index, upload))
+    finally:
+        # Committed uploads are linked into storage by now; the rest is discarded.
+        for tmp_path in staged:
+            os.unlink(tmp_path)
+
+    for _, upload in uploads:
+        start_processing(user.username, upload["path"], upload["blob_path"], upload["img_path"])
+    return results
+
+@router.post("/delete_books", response_model=List[BulkItemResult])
+def delete_books_endpoint(
+    request: BulkDeleteRequest,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_active_user),
+):
+    """Deletes several of the current user's books in a single transaction; each path gets its own result."""
+    paths = list(dict.fromkeys(request.paths))
+    if len(paths) > BULK_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_FILES} books per request")
+    results = []
+    for path, orphaned in delete_books(db, paths, owner=user.username).items():
+        if orphaned is None:
+            results.append(BulkItemResult(path=path, status="error", detail="Book not found"))
+            continue
+        failed = [file_path for file_path in orphaned if not delete_file(file_path)]
+        if failed:
+            logger.error("Failed to delete files of %s: %s", path, failed)
+        results.append(BulkItemResult(path=path, status="deleted", detail="Failed to delete files" if failed else None))
+    return results
+
 
@@ -4,11 +4,67 @@ from fastapi import HTTPException, status
 
 SECRET_KEY = os.getenv('SECRET_KEY')
 USERS_DB = os.getenv('DATABASE_URL')
+ASYNC_USERS_DB = os.getenv('ASYNC_DATABASE_URL')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+DB_POOL_WARM = int(os.getenv('DB_POOL_WARM', 0))
+WARM_UP = os.getenv('WARM_UP', 'false').lower() in ('1', 'true', 'yes')
 MEDIA_ASSETS = os.getenv('MEDIA_ASSETS')
 DOC_PATH = os.getenv('DOC_PATH')
 IMG_PATH = os.getenv('IMG_PATH')
+TEXT_CACHE_DIR = os.getenv('TEXT_CACHE_DIR') or (os.path.join(MEDIA_ASSETS, 'text_cache') if MEDIA_ASSETS else None)
+TEXT_CACHE_MAX_BYTES = int(os.getenv('TEXT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+READER_POOL_MAX_HANDLES = int(os.getenv('READER_POOL_MAX_HANDLES', 64))
+READER_POOL_MAX_BYTES = int(os.getenv('READER_POOL_MAX_BYTES', 1024 * 1024 * 1024))
+READER_POOL_READERS_PER_FILE = int(os.getenv('READER_POOL_READERS_PER_FILE', 4))
+COVER_WORKERS = int(os.getenv('COVER_WORKERS', 2))
+COVER_WEBP = os.getenv('COVER_WEBP', 'false').lower() in ('1', 'true', 'yes')
+COVER_CLAIM_SECONDS = float(os.getenv('COVER_CLAIM_SECONDS', 120))
+COVER_RETRY_SECONDS = float(os.getenv('COVER_RETRY_SECONDS', 600))
+SHARED_CACHE_URL = os.getenv('SHARED_CACHE_URL', '')
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', os.cpu_count() or 1))
+INGEST_BATCH_PAGES = int(os.getenv('INGEST_BATCH_PAGES', 16))
+INGEST_CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', 3000))
+OCR_ENABLED = os.getenv('OCR_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', os.cpu_count() or 1))
+OCR_DPI = int(os.getenv('OCR_DPI', 300))
+OCR_LANG = os.getenv('OCR_LANG', 'eng')
+OCR_WAIT_SECONDS = float(os.getenv('OCR_WAIT_SECONDS', 2))
+AUDIO_CACHE_DIR = os.getenv('AUDIO_CACHE_DIR') or (os.path.join(MEDIA_ASSETS, 'audio_cache') if MEDIA_ASSETS else None)
+AUDIO_CACHE_MAX_BYTES = int(os.getenv('AUDIO_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+TTS_DEFAULT_ENGINE = os.getenv('TTS_DEFAULT_ENGINE', 'local')
+PRESYNTH_WORKERS = int(os.getenv('PRESYNTH_WORKERS', 4))
+PRESYNTH_WINDOW = int(os.getenv('PRESYNTH_WINDOW', 3))
+PRESYNTH_PER_USER = int(os.getenv('PRESYNTH_PER_USER', 1))
+PRESYNTH_WAIT_SECONDS = float(os.getenv('PRESYNTH_WAIT_SECONDS', 10))
+PRESYNTH_IDLE_SECONDS = float(os.getenv('PRESYNTH_IDLE_SECONDS', 600))
+PROGRESS_FLUSH_SECONDS = float(os.getenv('PROGRESS_FLUSH_SECONDS', 5))
+PROGRESS_MAX_PENDING = int(os.getenv('PROGRESS_MAX_PENDING', 1000))
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH') or (os.path.join(MEDIA_ASSETS, 'search.db') if MEDIA_ASSETS else None)
+SEARCH_RESULTS_MAX = int(os.getenv('SEARCH_RESULTS_MAX', 100))
+BULK_MAX_FILES = int(os.getenv('BULK_MAX_FILES', 500))
+BULK_WORKERS = int(os.getenv('BULK_WORKERS', 4))
+BATCH_PAGES_MAX = int(os.getenv('BATCH_PAGES_MAX', 32))
+STREAM_WORKERS = int(os.getenv('STREAM_WORKERS', 4))
+STREAM_READ_AHEAD = int(os.getenv('STREAM_READ_AHEAD', 4))
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', os.cpu_count() or 1))
+HASH_QUEUE_DEPTH = int(os.getenv('HASH_QUEUE_DEPTH', 64))
+ADMISSION_MAX_ACTIVE = int(os.getenv('ADMISSION_MAX_ACTIVE', 2 * (os.cpu_count() or 1) + 2))
+ADMISSION_RESERVED_INTERACTIVE = int(os.getenv('ADMISSION_RESERVED_INTERACTIVE', 2))
+ADMISSION_PER_USER = int(os.getenv('ADMISSION_PER_USER', 8))
+ADMISSION_QUEUE_DEPTH = int(os.getenv('ADMISSION_QUEUE_DEPTH', 100))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 10))
+ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', 2))
+PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', 10000))
+PRINCIPAL_CACHE_TTL = float(os.getenv('PRINCIPAL_CACHE_TTL', 60))
+TRUST_TOKEN_CLAIMS = os.getenv('TRUST_TOKEN_CLAIMS', 'false').lower() in ('1', 'true', 'yes')
+BOOKS_PAGE_MAX = int(os.getenv('BOOKS_PAGE_MAX', 500))
 CREDENTIALS_EXCEPTION = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
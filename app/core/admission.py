@@ -0,0 +1,274 @@
+"""
+Admission control for the CPU-heavy endpoints.
+
+Page reads and uploads both run on the threadpool, so without limits a few
+large uploads can hold every thread while readers wait for their next page.
+Requests are admitted by priority class: reads ("interactive") go first and
+a few slots are reserved for them, uploads and whole-PDF parsing ("ingest")
+use the rest. Beyond the global cap requests wait in a bounded queue, in
+priority order and first come first served within a class; a full queue or
+a wait longer than ADMISSION_QUEUE_TIMEOUT is answered with 503, and a user
+with ADMISSION_PER_USER requests already running or queued gets 429. Both
+carry Retry-After. Anonymous requests only count towards the global cap.
+
+A slot is held only while the request computes: route dependencies release
+it when the handler returns, streamed responses take one per page or audio
+chunk, and answers from a cache (including 304s) don't take one at all. A
+stream computes its first item before the response starts, so a rejection
+is still a 429 or 503 rather than a 200 that breaks off.
+
+The state is per process: with several workers every limit applies to each
+worker separately.
+"""
+from anyio import from_thread
+from collections import deque
+from contextlib import contextmanager
+from fastapi import HTTPException, Request, status
+from jose import JWTError, jwt
+from const import (
+    SECRET_KEY, ALGORITHM, ADMISSION_MAX_ACTIVE, ADMISSION_RESERVED_INTERACTIVE, ADMISSION_PER_USER,
+    ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_TIMEOUT, ADMISSION_RETRY_AFTER,
+)
+from utils.metrics import Counter, Histogram, add_timing
+from time import perf_counter
+from typing import Iterator
+import asyncio
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Lower is served first.
+PRIORITIES = {"interactive": 0, "ingest": 1}
+
+admission_wait = Histogram(
+    "admission_wait_seconds", "Time requests waited in the admission queue.", ("priority",),
+)
+admission_outcomes = Counter(
+    "admission_requests_total", "Admission decisions by outcome: admitted, queued, rejected_user, rejected_full, timed_out.",
+    ("priority", "outcome"),
+)
+
+
+def request_identity(request: Request) -> str | None:
+    """
+    The user of the request's bearer token, if it carries a valid one.
+    Client addresses are no identity: behind a proxy every reader shares one.
+    """
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+        except JWTError:
+            pass
+    return None
+
+
+class AdmissionController:
+    """
+    Counts requests running per class and per user and hands freed slots to
+    the queued requests. All methods run on the event loop, so no lock is
+    needed. A non-positive `max_active` disables admission control.
+    """
+
+    def __init__(self, max_active: int, reserved_interactive: int, per_user: int, queue_depth: int, timeout: float, retry_after: int):
+        self.max_active = max_active
+        # Ingestion may use every slot but the reserved ones, and always at least one.
+        self.ingest_limit = max(1, max_active - reserved_interactive)
+        self.per_user = per_user
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._active = {priority: 0 for priority in PRIORITIES}
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        self._users = {}
+        self.rejected_user = 0
+        self.rejected_full = 0
+        self.timed_out = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_active > 0
+
+    def _limit(self, priority: str) -> int:
+        return self.max_active if priority == "interactive" else self.ingest_limit
+
+    def _can_start(self, priority: str) -> bool:
+        if sum(self._active.values()) >= self.max_active:
+            return False
+        return priority == "interactive" or self._active[priority] < self._limit(priority)
+
+    def _queued_ahead(self, priority: str) -> bool:
+        rank = PRIORITIES[priority]
+        return any(self._queues[other] for other, other_rank in PRIORITIES.items() if other_rank <= rank)
+
+    def _reject(self, status_code: int, detail: str, priority: str, outcome: str):
+        admission_outcomes.inc(priority=priority, outcome=outcome)
+        raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after)})
+
+    async def acquire(self, priority: str, user: str | None):
+        if user is not None and self._users.get(user, 0) >= self.per_user:
+            self.rejected_user += 1
+            self._reject(status.HTTP_429_TOO_MANY_REQUESTS, "Too many concurrent requests", priority, "rejected_user")
+        if self._can_start(priority) and not self._queued_ahead(priority):
+            self._start(priority, user)
+            admission_outcomes.inc(priority=priority, outcome="admitted")
+            return
+        if sum(len(queue) for queue in self._queues.values()) >= self.queue_depth:
+            self.rejected_full += 1
+            self._reject(status.HTTP_503_SERVICE_UNAVAILABLE, "Server is busy, try again shortly", priority, "rejected_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].append(waiter)
+        self._count(user)
+        admission_outcomes.inc(priority=priority, outcome="queued")
+        start = perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as the wait ran out.
+                return
+            self._abandon(priority, user, waiter)
+            self.timed_out += 1
+            logger.warning("Admission wait timed out: priority=%s", priority)
+            self._reject(status.HTTP_503_SERVICE_UNAVAILABLE, "Server is busy, try again shortly", priority, "timed_out")
+        except BaseException:
+            # The client went away while waiting.
+            if waiter.done() and not waiter.cancelled():
+                self.release(priority, user)
+            else:
+                self._abandon(priority, user, waiter)
+            raise
+        finally:
+            waited = perf_counter() - start
+            admission_wait.observe(waited, priority=priority)
+            add_timing("admission", waited)
+
+    def _start(self, priority: str, user: str | None):
+        self._active[priority] += 1
+        self._count(user)
+
+    def _count(self, user: str | None):
+        if user is not None:
+            self._users[user] = self._users.get(user, 0) + 1
+
+    def _abandon(self, priority: str, user: str | None, waiter: asyncio.Future):
+        try:
+            self._queues[priority].remove(waiter)
+        except ValueError:
+            pass
+        self._forget(user)
+        # A class that was waiting behind this request may be able to start now.
+        self._wake()
+
+    def _forget(self, user: str | None):
+        if user is None:
+            return
+        count = self._users.get(user, 0) - 1
+        if count > 0:
+            self._users[user] = count
+        else:
+            self._users.pop(user, None)
+
+    def release(self, priority: str, user: str | None):
+        self._active[priority] -= 1
+        self._forget(user)
+        self._wake()
+
+    def _wake(self):
+        for priority in sorted(PRIORITIES, key=PRIORITIES.get):
+            queue = self._queues[priority]
+            while queue and self._can_start(priority):
+                waiter = queue.popleft()
+                if waiter.done():
+                    continue
+                # The waiter's user was counted when it was queued.
+                self._active[priority] += 1
+                waiter.set_result(None)
+            if queue:
+                # Lower classes don't overtake a class that is still waiting.
+                return
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "max_active": self.max_active,
+            "ingest_limit": self.ingest_limit,
+            "per_user": self.per_user,
+            "queue_depth": self.queue_depth,
+            "active": dict(self._active),
+            "queued": {priority: len(queue) for priority, queue in self._queues.items()},
+            "users": len(self._users),
+            "rejected_user": self.rejected_user,
+            "rejected_full": self.rejected_full,
+            "timed_out": self.timed_out,
+        }
+
+
+admission = AdmissionController(
+    ADMISSION_MAX_ACTIVE, ADMISSION_RESERVED_INTERACTIVE, ADMISSION_PER_USER,
+    ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_TIMEOUT, ADMISSION_RETRY_AFTER,
+)
+
+
+def admit(priority: str):
+    """
+    A route dependency that holds an admission slot of the given class while
+    the handler runs. Declare it with `scope="function"`, otherwise the slot
+    is only released once the response has been sent.
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority class: {priority}")
+
+    async def dependency(request: Request):
+        if not admission.enabled:
+            yield
+            return
+        user = request_identity(request)
+        await admission.acquire(priority, user)
+        try:
+            yield
+        finally:
+            admission.release(priority, user)
+    return dependency
+
+
+@contextmanager
+def admitted(priority: str, user: str | None):
+    """
+    Holds an admission slot of the given class for the enclosed block. For
+    sync handlers and response generators, which run on the threadpool while
+    the controller lives on the event loop.
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority class: {priority}")
+    if not admission.enabled:
+        yield
+        return
+    from_thread.run(admission.acquire, priority, user)
+    try:
+        yield
+    finally:
+        from_thread.run_sync(admission.release, priority, user)
+
+
+def admitted_stream(priority: str, user: str | None, items: Iterator) -> Iterator:
+    """
+    Iterates `items` for a streamed response, holding an admission slot of the
+    given class only while each item is computed. The first item is computed
+    right away, so call this from the handler before building the response:
+    a rejection then raises before any status has been sent. Runs on the
+    threadpool, as `admitted` does.
+    """
+    with admitted(priority, user):
+        first = next(items, None)
+    return _admitted_rest(priority, user, items, first)
+
+def _admitted_rest(priority: str, user: str | None, items: Iterator, first) -> Iterator:
+    item = first
+    while item is not None:
+        yield item
+        with admitted(priority, user):
+            item = next(items, None)
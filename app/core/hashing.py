@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from const import HASH_WORKERS, HASH_QUEUE_DEPTH
+from utils.metrics import track
+import asyncio
+import threading
+
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded thread pool instead of the event loop.
+
+    bcrypt releases the GIL, so hashes run in parallel across cores. At most
+    `workers + queue_depth` operations may be pending; beyond that requests
+    are rejected with 503 rather than queueing without bound. With zero
+    workers hashing runs inline.
+    """
+
+    def __init__(self, workers: int, queue_depth: int):
+        self.workers = workers
+        self.capacity = workers + queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt") if workers > 0 else None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            with track("bcrypt"):
+                return fn(*args)
+        with self._lock:
+            if self._pending >= self.capacity:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many concurrent logins, try again shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        try:
+            with track("bcrypt"):
+                return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(pwd_context.verify, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.workers, "capacity": self.capacity, "pending": self._pending, "rejected": self.rejected}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(HASH_WORKERS, HASH_QUEUE_DEPTH)
@@ -0,0 +1,20 @@
+from const import PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL
+from schemas.user import User
+from utils.shared_cache import SharedTTLCache, shared_store
+from utils.ttl_cache import TTLCache
+
+
+# Authenticated principals by token subject, so that protected endpoints
+# don't have to load the user on every request. With several workers they
+# live in the shared store so that invalidations reach every worker.
+if shared_store.shared:
+    principal_cache = SharedTTLCache(
+        shared_store, "principal:", PRINCIPAL_CACHE_TTL,
+        encode=lambda principal: principal.model_dump_json().encode(),
+        decode=User.model_validate_json,
+    )
+else:
+    principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+def invalidate_principal(username: str):
+    principal_cache.pop(username)
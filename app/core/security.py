@@ -1,19 +1,17 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from db.models import User
-from db.database import get_db
-from db.crud import get_user_by_username, get_user_by_email, add_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.database import get_async_db
+from db.async_crud import get_user_by_username, get_user_by_email, add_user
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from schemas.user import TokenData, User
-from const import SECRET_KEY, ALGORITHM, CREDENTIALS_EXCEPTION
+from const import SECRET_KEY, ALGORITHM, CREDENTIALS_EXCEPTION, TRUST_TOKEN_CLAIMS
+from core.principals import principal_cache
+from core.hashing import pwd_context, password_hasher
 from datetime import datetime, timedelta, timezone
 from schemas.user import UserCreate
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
@@ -26,25 +24,37 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user_by_username(db, username)
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user_by_username(db, username)
     if not user:
         return False
-    if not verify_password(password, user.password):
+    if not await password_hasher.verify(password, user.password):
         return False
     return user
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         token_data = TokenData(username=username)
     except JWTError:
         raise CREDENTIALS_EXCEPTION
-    user = get_user_by_username(db, username=token_data.username)
+    if token_data.username is None:
+        raise CREDENTIALS_EXCEPTION
+
+    principal = principal_cache.get(token_data.username)
+    if principal is not None:
+        return principal
+    if TRUST_TOKEN_CLAIMS and payload.get("role"):
+        # Signed claims are trusted until the token expires; no lookup at all.
+        return User(username=token_data.username, role=payload["role"])
+
+    user = await get_user_by_username(db, username=token_data.username)
     if user is None:
         raise CREDENTIALS_EXCEPTION
-    return user
+    principal = User(username=user.username, email=user.email, full_name=user.fullname, role=user.role)
+    principal_cache.set(principal.username, principal)
+    return principal
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
     return current_user
@@ -59,9 +69,9 @@ async def get_user_with_role(role: str):
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
-def register_user(db: Session, user_create: UserCreate):
+async def register_user(db: AsyncSession, user_create: UserCreate):
     # Check if the email already exists
-    existing_user = get_user_by_email(db, user_create.email)
+    existing_user = await get_user_by_email(db, user_create.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -69,7 +79,7 @@ def register_user(db: Session, user_create: UserCreate):
         )
     
     # Check if the username already exists
-    existing_username = get_user_by_username(db, user_create.username)
+    existing_username = await get_user_by_username(db, user_create.username)
     if existing_username:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -77,8 +87,8 @@ def register_user(db: Session, user_create: UserCreate):
         )
 
     # Hash the password
-    hashed_password = hash_password(user_create.password)
+    hashed_password = await password_hasher.hash(user_create.password)
     
     # Add the new user to the database
-    new_user = add_user(db, fullname=user_create.fullname, email=user_create.email, password=hashed_password, username=user_create.username, role=user_create.role)
+    new_user = await add_user(db, fullname=user_create.fullname, email=user_create.email, password=hashed_password, username=user_create.username, role=user_create.role)
     return new_user
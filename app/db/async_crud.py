@@ -0,0 +1,87 @@
+"""
+Async counterparts of the CRUD functions used from async endpoints and
+dependencies, so that auth and metadata lookups don't block the event loop.
+"""
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from core.principals import invalidate_principal
+from .models import User, Book, TtsModel
+from .crud import books_page_query, split_books_page
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+async def add_user(db: AsyncSession, fullname: str, email: str, password: str, username: str, role: str = "user") -> User:
+    new_user = User(fullname=fullname, email=email, password=password, username=username, role=role)
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
+
+async def update_user(db: AsyncSession, username: str, fullname: str = None, email: str = None, password: str = None) -> User:
+    user = await get_user_by_username(db, username)
+    if user:
+        if fullname:
+            user.fullname = fullname
+        if email:
+            user.email = email
+        if password:
+            user.password = password
+        await db.commit()
+        invalidate_principal(username)
+        await db.refresh(user)
+        return user
+    return None
+
+async def get_user_by_username(db: AsyncSession, username: str) -> User:
+    return await db.scalar(select(User).where(User.username == username))
+
+async def get_user_by_email(db: AsyncSession, email: str) -> User:
+    return await db.scalar(select(User).where(User.email == email))
+
+async def delete_user(db: AsyncSession, username: str) -> bool:
+    user = await get_user_by_username(db, username)
+    if user:
+        await db.delete(user)
+        await db.commit()
+        invalidate_principal(username)
+        return True
+    return False
+
+async def get_books_page(db: AsyncSession, username: str, limit: int = None, cursor: str = None,
+                         sort: str = "path", descending: bool = False) -> tuple[list[Book], str | None]:
+    books = (await db.scalars(books_page_query(username, limit, cursor, sort, descending))).all()
+    return split_books_page(list(books), limit, sort)
+
+async def get_book_by_path(db: AsyncSession, path: str) -> Book:
+    # Eager-load the blob: Book.file_path can't lazy-load under asyncio.
+    return await db.scalar(select(Book).options(selectinload(Book.blob)).where(Book.path == path))
+
+async def get_book_or_404(db: AsyncSession, book_path: str) -> Book:
+    book = await get_book_by_path(db, book_path)
+    if book:
+        return book
+    else:
+        raise HTTPException(status_code=404, detail="Book not found")
+
+async def update_keys(db: AsyncSession, path: str, keys: dict, model_name: str = "standard"):
+    logger.info("Attempting to update keys for path: %s with model_name: %s", path, model_name)
+    tts_model = await db.scalar(select(TtsModel).where(TtsModel.path == path))
+    if tts_model:
+        tts_model.model_name = model_name
+        tts_model.model_keys = keys
+        await db.commit()
+        logger.info("Model updated successfully for path: %s", path)
+        return tts_model
+    logger.warning("No TTS model found for path: %s", path)
+    return None
+
+async def get_model_by_path(db: AsyncSession, path) -> dict:
+    tts_model = await db.scalar(select(TtsModel).where(TtsModel.path == path))
+    if tts_model:
+        return {"name": tts_model.model_name, "keys": tts_model.model_keys}
+    return None
@@ -1,28 +1,31 @@
 from fastapi import HTTPException
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from const import USERS_DB
-from .models import User, Book, TtsModel
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+from const import UPLOAD_CHUNK_SIZE
+from core.principals import invalidate_principal, principal_cache
+from .models import User, Book, TtsModel, Blob
+from .progress import progress_buffer
+from utils.text_cache import page_text_cache
+from utils.ingest import ingestion
+from utils.reader_pool import reader_pool
+from utils.covers import cover_files
+from utils.search import search_index
 import logging
-from io import BytesIO
+from collections import Counter
+from datetime import datetime, timezone
+from typing import BinaryIO
+import base64
+import hashlib
+import json
 import os
+import tempfile
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-
-load_dotenv()
-Base = declarative_base()
-
-engine = create_engine(USERS_DB)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-Base.metadata.create_all(bind=engine)
-
 def add_user(db: Session, fullname: str, email: str, password: str, username: str, role: str = "user") -> User:
     new_user = User(fullname=fullname, email=email, password=password, username=username, role=role)
     db.add(new_user)
@@ -40,6 +43,7 @@ def update_user(db: Session, username: str, fullname: str = None, email: str = N
         if password:
             user.password = password
         db.commit()
+        invalidate_principal(username)
         db.refresh(user)
         return user
     return None
@@ -58,62 +62,204 @@ def delete_user(db: Session, username: str) -> bool:
     if user:
         db.delete(user)
         db.commit()
+        invalidate_principal(username)
         return True
     return False
 
 def delete_all_users(db: Session):
     db.query(User).delete()
     db.commit()
+    principal_cache.clear()
 
 
-def create_book(db: Session, path: str, metadata: dict) -> Book:
-    logger.info(f'Creating a new book with path: {path} and metadata: {metadata}')
-    new_book = Book(path=path, metadata_=metadata, page_idx=0)
-    
-    # Create the associated TtsModel with standard values
-    new_tts_model = TtsModel(
-        model_name="standard",
-        model_keys={},
-        path=path
+def book_title(path: str, metadata: dict, owner: str = None) -> str:
+    title = metadata.get('/Title')
+    if not title:
+        title = os.path.splitext(os.path.basename(path))[0]
+        if owner and title.startswith(f"{owner}_"):
+            title = title[len(owner) + 1:]
+    return str(title)[:512]
+
+def stage_upload(file_obj: BinaryIO, directory: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> tuple[str, str]:
+    """
+    Stream an uploaded file into a temporary file in `directory`.
+
+    The data is copied chunk by chunk and hashed on the way, so memory use
+    does not depend on the file size. Returns the temporary path and the
+    SHA-256 hex digest of the content.
+    """
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while chunk := file_obj.read(chunk_size):
+                digest.update(chunk)
+                f.write(chunk)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
+
+def _reference_blob(db: Session, upload: dict, count: int = 1) -> bool:
+    """
+    Takes `count` references on an upload's blob, creating its row if there
+    is none, and returns True if the row was created. The UPDATE comes first
+    so that the row (on SQLite, the database) is locked before the blob's
+    file is touched.
+    """
+    updated = db.query(Blob).filter(Blob.sha256 == upload['sha256']).update(
+        {Blob.ref_count: Blob.ref_count + count}, synchronize_session=False
     )
+    if updated:
+        return False
+    db.add(Blob(sha256=upload['sha256'], path=upload['blob_path'], img_path=upload['img_path'],
+                size=upload['size'], ref_count=count))
+    db.flush()
+    return True
 
+def _link_staged(tmp_path: str, blob_path: str):
     try:
-        db.add(new_book)
-        db.add(new_tts_model)
+        os.link(tmp_path, blob_path)
+        logger.info("File saved successfully to %s", blob_path)
+    except FileExistsError:
+        pass
+
+def _insert_uploaded_books(db: Session, uploads: list[dict], owner: str) -> list[Book]:
+    created = []
+    try:
+        counts = Counter(upload['sha256'] for upload in uploads)
+        for upload in {upload['sha256']: upload for upload in uploads}.values():
+            if _reference_blob(db, upload, counts[upload['sha256']]):
+                created.append(upload['blob_path'])
+            # Linked while the blob's row is locked, so a concurrent delete of
+            # the same content can't unlink the file in between.
+            _link_staged(upload['tmp_path'], upload['blob_path'])
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        books = []
+        for upload in uploads:
+            book = Book(
+                path=upload['path'],
+                metadata_=upload['metadata'],
+                page_idx=0,
+                content_hash=upload['sha256'],
+                owner=owner,
+                title=book_title(upload['path'], upload['metadata'], owner),
+                last_opened=now,
+            )
+            db.add(book)
+            db.add(TtsModel(model_name="standard", model_keys={}, path=upload['path']))
+            books.append(book)
+        db.flush()
         db.commit()
-        db.refresh(new_book)
-        logger.info(f'Book created with path: {new_book.path}')
-        return new_book
-    except SQLAlchemyError as e:
+    except BaseException:
+        # Files of blobs created here are referenced by nothing once this
+        # transaction rolls back; remove them before the lock is released.
+        for blob_path in created:
+            try:
+                os.remove(blob_path)
+            except OSError:
+                pass
         db.rollback()
-        logger.error(f'Failed to create book with path: {path}. Error: {e}')
-        return None
+        raise
+    return books
 
-def save_file(file_obj: BytesIO, file_path: str) -> bool:
+def create_uploaded_books(db: Session, uploads: list[dict], owner: str, attempts: int = 3) -> list[Book]:
     """
-    Save the file to the media assets.
+    Create books for staged uploads and link them into content-addressed storage.
 
-    Parameters:
-    file_obj (BytesIO): The file object to be saved.
+    Each upload has the book `path`, its `metadata`, the staged `tmp_path`
+    and the blob's `sha256`, `blob_path`, `img_path` and `size`. The blob
+    references, the blob files and the books are committed together; on
+    failure nothing is left behind except the staged files, which belong to
+    the caller. Raises IntegrityError if a book path is already taken.
     """
-
-    if os.path.exists(file_path):
-        print(f"File already exists. Skipping save.")
-        return False
-
-    try:
-        with open(f"{file_path}", 'wb') as f:
-            f.write(file_obj.getbuffer())
-        print(f"File saved successfully to {file_path}")
-        return True
-    except Exception as e:
-        print(f"An error occurred while saving the file: {e}")
-        return False
+    for attempt in range(attempts):
+        try:
+            books = _insert_uploaded_books(db, uploads, owner)
+            logger.info('Created %s books for %s', len(books), owner)
+            return books
+        except IntegrityError:
+            # Either a path is taken or a concurrent upload created the same blob first.
+            if attempt == attempts - 1 or get_existing_book_paths(db, [upload['path'] for upload in uploads]):
+                raise
     
+BOOK_SORT_COLUMNS = {
+    "path": Book.path,
+    "title": Book.title,
+    "last_opened": Book.last_opened,
+}
+
 def get_all_books(db: Session, username: str) -> list[Book]:
-    books = db.query(Book).filter(Book.path.like(f"%{username}%")).all()
+    books = db.query(Book).filter(Book.owner == username).all()
     return books if books else []
 
+def encode_cursor(book: Book, sort: str) -> str:
+    value = getattr(book, sort)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, book.path]).encode()).decode()
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        value, path = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort == "last_opened":
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, path
+
+def books_page_query(username: str, limit: int = None, cursor: str = None,
+                     sort: str = "path", descending: bool = False) -> Select:
+    """
+    Keyset-paginated listing of a user's books.
+
+    Rows are ordered by (sort column, path) so the position is unique, and
+    each page starts right after the cursor instead of at an OFFSET, which
+    keeps every page an index range scan on (owner, sort column, path).
+    One extra row is fetched to tell whether there is a next page.
+    """
+    column = BOOK_SORT_COLUMNS.get(sort)
+    if column is None:
+        raise HTTPException(status_code=400, detail=f"Sort must be one of: {', '.join(BOOK_SORT_COLUMNS)}")
+    key = [column] if column is Book.path else [column, Book.path]
+
+    query = select(Book).where(Book.owner == username)
+    if cursor:
+        value, path = decode_cursor(cursor, sort)
+        if column is Book.path:
+            position, after = Book.path, path
+        else:
+            position, after = tuple_(column, Book.path), tuple_(value, path)
+        query = query.where(position < after if descending else position > after)
+    query = query.order_by(*[k.desc() for k in key] if descending else key)
+    return query if limit is None else query.limit(limit + 1)
+
+def split_books_page(books: list[Book], limit: int, sort: str) -> tuple[list[Book], str | None]:
+    if limit is not None and len(books) > limit:
+        return books[:limit], encode_cursor(books[limit - 1], sort)
+    return books, None
+
+def get_books_page(db: Session, username: str, limit: int = None, cursor: str = None,
+                   sort: str = "path", descending: bool = False) -> tuple[list[Book], str | None]:
+    books = db.execute(books_page_query(username, limit, cursor, sort, descending)).scalars().all()
+    return split_books_page(list(books), limit, sort)
+
+def get_book_by_path(db: Session, path: str) -> Book:
+    return db.query(Book).filter(Book.path == path).first()
+
+def get_existing_book_paths(db: Session, paths: list[str]) -> set[str]:
+    return set(db.scalars(select(Book.path).where(Book.path.in_(paths))))
+
+def get_book_or_404(db: Session, book_path: str) -> Book:
+    book = get_book_by_path(db, book_path)
+    if book:
+        return book
+    else:
+        raise HTTPException(status_code=404, detail="Book not found")
+
+def get_book_file(db: Session, book_path: str) -> str:
+    return get_book_or_404(db, book_path).file_path
+
 def get_book_image_path(db: Session, book_path: str) -> str:
     book = db.query(Book).filter(Book.path == book_path).first()
     if book:
@@ -121,26 +267,98 @@ def get_book_image_path(db: Session, book_path: str) -> str:
     else:
         raise HTTPException(status_code=404, detail="Book not found")
     
-def delete_book(db: Session, path: str) -> bool:
-    book = db.query(Book).filter(Book.path == path).first()
-    if book:
+def delete_book(db: Session, path: str) -> list[str] | None:
+    """
+    Delete a book and release its content.
+
+    Returns the files that are no longer referenced by any book and should be
+    removed from disk, or None if the book does not exist. Shared content is
+    only released when its last book is deleted.
+    """
+    return delete_books(db, [path])[path]
+
+def delete_books(db: Session, paths: list[str], owner: str = None) -> dict[str, list[str] | None]:
+    """
+    Delete several books in one transaction; see `delete_book`.
+
+    With `owner` set, books of other users are treated as missing.
+    """
+    query = db.query(Book).filter(Book.path.in_(paths))
+    if owner is not None:
+        query = query.filter(Book.owner == owner)
+    books = query.all()
+    results = dict.fromkeys(paths)
+    released = Counter()
+    blobs = {}
+    doc_files = {}
+    deleted = [(book.path, book.content_hash) for book in books]
+    for book in books:
+        results[book.path] = []
+        doc_files[book.path] = book.file_path
+        if book.blob is None:
+            results[book.path] = cover_files(book.metadata_['img_path']) + [book.path]
+        else:
+            released[book.blob.sha256] += 1
+            blobs[book.blob.sha256] = book.blob
         db.delete(book)
+    for sha256, count in released.items():
+        db.query(Blob).filter(Blob.sha256 == sha256).update(
+            {Blob.ref_count: Blob.ref_count - count}, synchronize_session=False
+        )
+    db.flush()
+    orphaned_blobs = set()
+    trashed = {}
+    try:
+        for sha256, blob in blobs.items():
+            db.refresh(blob)
+            if blob.ref_count <= 0:
+                orphaned_blobs.add(sha256)
+                db.delete(blob)
+                # Moved aside while the blob's row is locked, so that an upload
+                # of the same content waits and then links a fresh file.
+                trash = f"{blob.path}.deleted"
+                try:
+                    os.replace(blob.path, trash)
+                    trashed[blob.path] = trash
+                except FileNotFoundError:
+                    pass
         db.commit()
-        return True
-    else:
-        return False
+    except BaseException:
+        for blob_path, trash in trashed.items():
+            os.replace(trash, blob_path)
+        db.rollback()
+        raise
+
+    for path, content_hash in deleted:
+        progress_buffer.forget(path)
+        try:
+            search_index.remove_book(path)
+        except Exception as e:
+            # The book is gone either way; its files still have to be deleted.
+            logger.error("Failed to remove %s from the search index: %s", path, e)
+        if content_hash in orphaned_blobs:
+            # Several deleted books may share an orphaned blob; its files are listed once.
+            blob = blobs.pop(content_hash, None)
+            if blob is not None:
+                results[path] = cover_files(blob.img_path) + ([trashed[blob.path]] if blob.path in trashed else [])
+        if results[path]:
+            doc_file = doc_files[path]
+            ingestion.forget(doc_file)
+            page_text_cache.invalidate(doc_file)
+            reader_pool.evict(doc_file)
+    return results
 
 def update_keys(db: Session, path: str, keys: dict, model_name: str="standard"):
-    logger.info(f"Attempting to update keys for path: {path} with model_name: {model_name} and keys: {keys}")
+    logger.info("Attempting to update keys for path: %s with model_name: %s", path, model_name)
     tts_model = db.query(TtsModel).filter(TtsModel.path == path).first()
     if tts_model:
-        logger.info(f"Found TTS model for path: {path}. Updating model_name and keys.")
+        logger.info("Found TTS model for path: %s. Updating model_name and keys.", path)
         tts_model.model_name = model_name
         tts_model.model_keys = keys
         db.commit()
-        logger.info(f"Model updated successfully for path: {path}")
+        logger.info("Model updated successfully for path: %s", path)
         return tts_model
-    logger.warning(f"No TTS model found for path: {path}")
+    logger.warning("No TTS model found for path: %s", path)
     return None
 
 def get_model_by_path(db: Session, path) -> dict:
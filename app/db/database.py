@@ -1,19 +1,129 @@
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
+from time import perf_counter
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from const import USERS_DB
+from sqlalchemy.pool import QueuePool
+import threading
+from utils.metrics import observe_operation
+from const import USERS_DB, ASYNC_USERS_DB, DB_POOL_WARM, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
 
 
 load_dotenv()
 
-engine = create_engine(USERS_DB)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+}
+
+def async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {parsed.drivername}; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+def pool_options(url: str) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database not in (None, "", ":memory:"):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+def pool_stats(engine) -> dict:
+    pool = engine.pool
+    stats = {"class": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    return stats
+
+def track_queries(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # Kept on the execution context: a query that fails never reaches the after hook.
+        context._query_start = perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        observe_operation("db_query", perf_counter() - context._query_start)
+
+def warm_count(engine, connections: int) -> int:
+    # Connections beyond the pool size would be overflow, closed as soon as they're returned.
+    pool = engine.pool
+    return min(connections, pool.size()) if isinstance(pool, QueuePool) else min(connections, 1)
+
+def warm_pool(engine, connections: int = DB_POOL_WARM):
+    """Opens pooled connections up front so that a new worker's first requests don't pay for connecting."""
+    held = []
+    try:
+        for _ in range(warm_count(engine, connections)):
+            held.append(engine.connect())
+    finally:
+        for conn in held:
+            conn.close()
+
+async def warm_async_pool(engine, connections: int = DB_POOL_WARM):
+    held = []
+    try:
+        for _ in range(warm_count(engine.sync_engine, connections)):
+            held.append(await engine.connect())
+    finally:
+        for conn in held:
+            await conn.close()
+
+# Created by init_engines(), at startup in the app's lifespan or on first use elsewhere.
+engine = None
+async_engine = None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+_init_lock = threading.Lock()
+
+def init_engines():
+    """Creates the sync and async engines once and binds the session factories to them."""
+    global engine, async_engine
+    with _init_lock:
+        if engine is None:
+            async_db_url = ASYNC_USERS_DB or async_url(USERS_DB)
+            async_engine = create_async_engine(async_db_url, **pool_options(async_db_url))
+            track_queries(async_engine.sync_engine)
+            AsyncSessionLocal.configure(bind=async_engine)
+            sync_engine = create_engine(USERS_DB, **pool_options(USERS_DB))
+            track_queries(sync_engine)
+            SessionLocal.configure(bind=sync_engine)
+            engine = sync_engine
+
+def get_db_engine():
+    if engine is None:
+        init_engines()
+    return engine
+
+def get_async_db_engine():
+    if engine is None:
+        init_engines()
+    return async_engine
+
+async def dispose_engines():
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
 
 def get_db():
+    get_db_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    get_db_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
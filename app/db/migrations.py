@@ -0,0 +1,97 @@
+"""
+Idempotent schema upgrades for existing databases.
+
+Run from the app directory with `python -m db.migrations`. Missing tables
+are created from the models; columns added to existing tables are applied
+here because `create_all` never alters a table that already exists.
+"""
+from sqlalchemy import bindparam, func, inspect, select, text, update
+from sqlalchemy.engine import Connection
+from .database import get_db_engine
+from .models import Base, Book, User
+from .crud import book_title
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+def _columns(conn: Connection, table: str) -> set[str]:
+    return {column['name'] for column in inspect(conn).get_columns(table)}
+
+def add_book_content_hash(conn: Connection):
+    if 'content_hash' in _columns(conn, 'book'):
+        return
+    conn.execute(text("ALTER TABLE book ADD COLUMN content_hash VARCHAR(64) REFERENCES blob (sha256)"))
+    conn.execute(text("CREATE INDEX ix_book_content_hash ON book (content_hash)"))
+    logger.info("Added book.content_hash")
+
+def add_book_owner(conn: Connection):
+    columns = _columns(conn, 'book')
+    if 'owner' not in columns:
+        conn.execute(text("ALTER TABLE book ADD COLUMN owner VARCHAR(255) REFERENCES users (username)"))
+    if 'title' not in columns:
+        conn.execute(text("ALTER TABLE book ADD COLUMN title VARCHAR(512)"))
+    if 'last_opened' not in columns:
+        conn.execute(text("ALTER TABLE book ADD COLUMN last_opened TIMESTAMP"))
+    indexes = {index['name'] for index in inspect(conn).get_indexes('book')}
+    for index in Book.__table__.indexes:
+        if index.name not in indexes:
+            index.create(conn)
+            logger.info("Created index %s", index.name)
+
+def backfill_book_owner(conn: Connection, batch_size: int = 1000):
+    """
+    Sets owner and title of books that predate those columns, `batch_size`
+    books at a time in path order. Every book that has been looked at gets a
+    title, so books whose owner can't be told are not looked at again.
+    """
+    # Books used to be attributed by the "{username}_" prefix of their file name.
+    usernames = set(conn.execute(select(User.username)).scalars())
+    book = Book.__table__
+    statement = (
+        update(book)
+        .where(book.c.path == bindparam("b_path"))
+        .values(owner=bindparam("owner"), title=bindparam("title"))
+    )
+    backfilled = 0
+    last_path = None
+    while True:
+        query = select(book.c.path, book.c.metadata).where(book.c.title.is_(None))
+        if last_path is not None:
+            query = query.where(book.c.path > last_path)
+        rows = conn.execute(query.order_by(book.c.path).limit(batch_size)).all()
+        if not rows:
+            break
+        updates = []
+        for path, metadata in rows:
+            name = os.path.basename(path)
+            # The longest matching username wins, as it did when names were parsed.
+            prefixes = (name[:end] for end in range(len(name) - 1, 0, -1) if name[end] == '_')
+            owner = next((prefix for prefix in prefixes if prefix in usernames), None)
+            updates.append({"b_path": path, "owner": owner, "title": book_title(path, metadata or {}, owner)})
+        conn.execute(statement, updates)
+        backfilled += len(updates)
+        last_path = rows[-1][0]
+    conn.execute(update(book).where(book.c.last_opened.is_(None)).values(last_opened=func.now()))
+    if backfilled:
+        logger.info("Backfilled owner and title of %s books", backfilled)
+
+MIGRATIONS = [
+    add_book_content_hash,
+    add_book_owner,
+    backfill_book_owner,
+]
+
+def upgrade(bind=None):
+    bind = bind or get_db_engine()
+    Base.metadata.create_all(bind=bind)
+    for migration in MIGRATIONS:
+        with bind.begin() as conn:
+            migration(conn)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    upgrade()
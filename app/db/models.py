@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey, JSON, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -23,11 +23,39 @@ class TtsModel(Base):
 
     books = relationship("Book", back_populates="tts_model")
 
+class Blob(Base):
+    __tablename__ = 'blob'
+
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String(512), nullable=False)
+    img_path = Column(String(512), nullable=False)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+
+    books = relationship("Book", back_populates="blob")
+
 class Book(Base):
     __tablename__ = 'book'
 
     path = Column(String(512), primary_key=True)
     metadata_ = Column("metadata", JSON)
     page_idx = Column(Integer, default=0)
+    content_hash = Column(String(64), ForeignKey('blob.sha256'), nullable=True, index=True)
+    owner = Column(String(255), ForeignKey('users.username'), nullable=True)
+    title = Column(String(512), nullable=True)
+    last_opened = Column(DateTime, nullable=True)
+
+    # Per-owner listings are served by keyset scans over these indexes.
+    __table_args__ = (
+        Index('ix_book_owner_path', 'owner', 'path'),
+        Index('ix_book_owner_title', 'owner', 'title', 'path'),
+        Index('ix_book_owner_last_opened', 'owner', 'last_opened', 'path'),
+    )
+
+    tts_model = relationship("TtsModel", back_populates="books")
+    blob = relationship("Blob", back_populates="books")
 
-    tts_model = relationship("TtsModel", back_populates="books")
\ No newline at end of file
+    @property
+    def file_path(self) -> str:
+        # Books uploaded before content-addressed storage own their file.
+        return self.blob.path if self.blob else self.path
\ No newline at end of file
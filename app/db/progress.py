@@ -0,0 +1,129 @@
+"""
+Write-behind buffer for reading positions.
+
+Clients report their position on every page turn or audio chunk. Updates are
+coalesced in memory per book (a book row belongs to one user) and written in
+batched UPDATEs every PROGRESS_FLUSH_SECONDS, when PROGRESS_MAX_PENDING books
+are waiting, and at shutdown. PROGRESS_FLUSH_SECONDS=0 writes through.
+
+With several workers each one buffers and flushes its own updates. A row is
+only written if its `last_opened` is not newer than the buffered update, so a
+worker flushing late can't overwrite a position another worker already wrote.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import bindparam, or_, update
+from const import PROGRESS_FLUSH_SECONDS, PROGRESS_MAX_PENDING
+from .database import get_db_engine
+from .models import Book
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressBuffer:
+    def __init__(self, flush_seconds: float, max_pending: int, bind=None):
+        # None writes through the app's engine, created on first use.
+        self.bind = bind
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Serializes flushes so batches reach the database in order.
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.updates = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    def record(self, path: str, page_idx: int):
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        with self._lock:
+            self._pending[path] = (page_idx, now)
+            self.updates += 1
+            pending = len(self._pending)
+        if self.flush_seconds <= 0:
+            self.flush()
+            return
+        self._start()
+        if pending >= self.max_pending:
+            self._wakeup.set()
+
+    def pending(self, path: str) -> int | None:
+        """A position not yet written to the database, so readers see their latest update."""
+        with self._lock:
+            entry = self._pending.get(path)
+        return entry[0] if entry else None
+
+    def forget(self, path: str):
+        with self._lock:
+            self._pending.pop(path, None)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return
+            rows = [
+                {"b_path": path, "page_idx": page_idx, "last_opened": opened}
+                for path, (page_idx, opened) in batch.items()
+            ]
+            statement = (
+                update(Book.__table__)
+                .where(Book.__table__.c.path == bindparam("b_path"))
+                # Last write wins across workers.
+                .where(or_(
+                    Book.__table__.c.last_opened.is_(None),
+                    Book.__table__.c.last_opened <= bindparam("last_opened"),
+                ))
+                .values(page_idx=bindparam("page_idx"), last_opened=bindparam("last_opened"))
+            )
+            try:
+                with (self.bind or get_db_engine()).begin() as conn:
+                    conn.execute(statement, rows)
+            except Exception as e:
+                logger.error("Failed to write %s reading positions: %s", len(rows), e)
+                with self._lock:
+                    # Keep them for the next flush unless newer positions arrived meanwhile.
+                    for path, entry in batch.items():
+                        self._pending.setdefault(path, entry)
+                return
+            with self._lock:
+                self.flushes += 1
+                self.rows_written += len(rows)
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._stopped.is_set():
+                    self._thread = threading.Thread(target=self._run, name="progress-flush", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "updates": self.updates,
+                "flushes": self.flushes,
+                "rows_written": self.rows_written,
+            }
+
+    def shutdown(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+progress_buffer = ProgressBuffer(PROGRESS_FLUSH_SECONDS, PROGRESS_MAX_PENDING)
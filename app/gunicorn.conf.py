@@ -0,0 +1,37 @@
+"""
+Multi-worker deployment. From the app directory:
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Each worker is a separate process with its own pools and in-process caches.
+Page text, covers and audio are shared through files under MEDIA_ASSETS;
+principals, cover claims and ingestion status go through SHARED_CACHE_URL,
+which defaults to a SQLite file next to the media assets when there is more
+than one worker. Reading positions are buffered per worker and written
+last-write-wins. Admission, hashing queues and pre-synthesis listeners
+remain per worker.
+Per-worker pools are sized so that all workers together use about one
+thread or process per core.
+"""
+import multiprocessing
+import os
+import tempfile
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+timeout = int(os.getenv("WORKER_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+# The environment is inherited by the workers, which read it when const is imported.
+if workers > 1 and not os.getenv("SHARED_CACHE_URL"):
+    os.environ["SHARED_CACHE_URL"] = f"sqlite:///{os.path.join(os.getenv('MEDIA_ASSETS') or tempfile.gettempdir(), 'shared_cache.db')}"
+per_worker = str(max(1, multiprocessing.cpu_count() // workers))
+for name in ("INGEST_WORKERS", "OCR_WORKERS", "HASH_WORKERS"):
+    os.environ.setdefault(name, per_worker)
+# Admission limits are counted per worker too.
+os.environ.setdefault("ADMISSION_MAX_ACTIVE", str(2 * int(per_worker) + 2))
+# Each worker opens its DB connections at startup, in the app's lifespan.
+os.environ.setdefault("DB_POOL_WARM", "2")
+
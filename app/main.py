@@ -1,8 +1,44 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from api import endpoints
+from utils.ingest import ingestion
+from utils.covers import cover_renderer
+from utils.page_stream import page_streamer
+from utils.ocr import ocr_pool
+from utils.presynth import presynthesizer
+from utils.search import search_index
+from db.database import init_engines, get_db_engine, get_async_db_engine, dispose_engines, warm_pool, warm_async_pool
+from db.progress import progress_buffer
+from core.hashing import password_hasher
+from utils.metrics import MetricsMiddleware
+from utils.pdf_utils import preload
+from const import DB_POOL_WARM, WARM_UP
+import threading
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_engines()
+    if DB_POOL_WARM:
+        await run_in_threadpool(warm_pool, get_db_engine())
+        await warm_async_pool(get_async_db_engine())
+    if WARM_UP:
+        # In the background: the worker starts serving while the PDF libraries load.
+        threading.Thread(target=preload, name="warm-up", daemon=True).start()
+    yield
+    ingestion.shutdown()
+    cover_renderer.shutdown()
+    page_streamer.shutdown()
+    ocr_pool.shutdown()
+    presynthesizer.shutdown()
+    search_index.shutdown()
+    progress_buffer.shutdown()
+    password_hasher.shutdown()
+    await dispose_engines()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost",
@@ -19,6 +55,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(endpoints.router)
 
 if __name__ == "__main__":
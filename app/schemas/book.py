@@ -1,11 +1,33 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 
 class TextToSpeechRequest(BaseModel):
     text: str
     voice_id: str = "Joanna"
+    path: Optional[str] = None
+    model_name: Optional[str] = None
     
+class TtsPositionRequest(BaseModel):
+    path: str
+    page: int
+    chunk: int = 0
+    voice_id: str = "Joanna"
+    model_name: Optional[str] = None
+
+class ProgressUpdate(BaseModel):
+    path: str
+    page_idx: int = Field(ge=0)
+
+class BulkDeleteRequest(BaseModel):
+    paths: List[str]
+
+class BulkItemResult(BaseModel):
+    path: Optional[str] = None
+    filename: Optional[str] = None
+    status: str
+    detail: Optional[str] = None
+
 class TextResponseModel(BaseModel):
     text: str
 
@@ -16,3 +38,22 @@ class ChunkTextRequest(BaseModel):
 
 class ChunkTextResponse(BaseModel):
     chunks: List[str]
+
+class PageTextResponse(BaseModel):
+    text: str
+    source: str = "text"
+
+class PageText(BaseModel):
+    page: int
+    text: str
+    source: str = "text"
+
+class PagesResponse(BaseModel):
+    pages: List[PageText]
+
+class IngestStatusResponse(BaseModel):
+    status: str
+    pages_done: int = 0
+    pages_total: Optional[int] = None
+    pages_ocr: int = 0
+    error: Optional[str] = None
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from const import AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES
+from .chunking import normalize_text
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+def audio_key(text: str, model_name: str, voice: str, model_keys: dict | None) -> str:
+    """Content address of a synthesized segment; whitespace differences map to the same audio."""
+    keys_hash = hashlib.sha256(json.dumps(model_keys or {}, sort_keys=True).encode()).hexdigest()
+    identity = json.dumps([normalize_text(text), model_name, voice, keys_hash])
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+
+class AudioCache:
+    """
+    Content-addressed store of synthesized audio segments on disk.
+
+    Total size is bounded by `max_bytes`; the least recently used segments
+    are evicted first. The index is rebuilt from the directory on first use,
+    ordered by access time, so it survives restarts.
+    """
+
+    def __init__(self, cache_dir: str | None, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}{extension}")
+
+    def _index(self) -> OrderedDict:
+        # Called with the lock held.
+        if self._entries is None:
+            found = []
+            for root, _, names in os.walk(self.cache_dir or ""):
+                for name in names:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    found.append((st.st_atime, path, st.st_size))
+            self._entries = OrderedDict((path, size) for _, path, size in sorted(found))
+            self._bytes = sum(self._entries.values())
+        return self._entries
+
+    def get(self, key: str, extension: str) -> str | None:
+        if not self.cache_dir:
+            return None
+        path = self._path(key, extension)
+        with self._lock:
+            entries = self._index()
+            if path in entries:
+                entries.move_to_end(path)
+                self.hits += 1
+            else:
+                self.misses += 1
+                return None
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._drop(path)
+            return None
+        return path
+
+    def writer(self, key: str, extension: str) -> "AudioWriter | None":
+        if not self.cache_dir:
+            return None
+        return AudioWriter(self, self._path(key, extension))
+
+    def _add(self, path: str, size: int):
+        with self._lock:
+            entries = self._index()
+            self._drop(path)
+            entries[path] = size
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(entries) > 1:
+                evicted, _ = next(iter(entries.items()))
+                self._drop(evicted)
+                self.evictions += 1
+                try:
+                    os.remove(evicted)
+                except OSError:
+                    pass
+
+    def _drop(self, path: str):
+        size = self._index().pop(path, None)
+        if size is not None:
+            self._bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._index() if self.cache_dir else {}
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class AudioWriter:
+    """Writes a segment as it is produced; it only becomes visible in the cache once complete."""
+
+    def __init__(self, cache: AudioCache, path: str):
+        self._cache = cache
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A unique name: a streaming response resumes its generator on any
+        # threadpool thread, so thread ids don't tell concurrent writers apart.
+        fd, self._tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        self._file = os.fdopen(fd, 'wb')
+        self._size = 0
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        self._size += len(data)
+
+    def commit(self):
+        try:
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+        except OSError as e:
+            # The audio has been sent already; it just doesn't get cached.
+            logger.warning("Failed to cache audio %s: %s", self.path, e)
+            self.abort()
+            return
+        self._cache._add(self.path, self._size)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+
+audio_cache = AudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES)
@@ -0,0 +1,196 @@
+from typing import Iterator, List
+import re
+
+
+# Lower-cased, without the final period.
+ABBREVIATIONS = frozenset("""
+    mr mrs ms dr prof sr jr st mt ft vs etc e.g i.e cf al viz approx
+    fig figs no nos vol vols ch chap sec p pp ed eds rev gen col lt sgt capt
+    inc ltd co corp dept est jan feb mar apr jun jul aug sep sept oct nov dec
+""".split())
+
+_BOUNDARY = re.compile(r'[.!?]+["\'”’)\]]* (?=\S)')
+# The lookbehind follows the hyphen so that the search can skip ahead to each '-'.
+_HYPHEN_BREAK = re.compile(r'-(?<=\w-)[ \t]*\n\s*(?=\w)')
+# Only runs that aren't already a single space, so clean text is left as is.
+_WHITESPACE = re.compile(r' \s+|[^\S ]\s*')
+_TRAILING = frozenset('.!?"\'”’)]')
+_OPENING = '"\'(“‘['
+_MAX_WORD = max(map(len, ABBREVIATIONS)) + len(_OPENING)
+# Raw text carried over between pieces is normally a word and its trailing space.
+_MAX_HOLD = 1024
+
+
+def _normalize(text: str) -> str:
+    # Join words hyphenated across line breaks, then collapse whitespace runs.
+    return _WHITESPACE.sub(' ', _HYPHEN_BREAK.sub('', text))
+
+
+def normalize_text(text: str) -> str:
+    return _normalize(text).strip()
+
+
+def _settled_length(raw: str) -> int:
+    """
+    Length of the prefix of `raw` that no text appended later can change: a
+    cut after a character that is neither whitespace nor a hyphen, and before
+    one that isn't a hyphen, splits no whitespace run or hyphenated break.
+    """
+    stop = max(len(raw) - _MAX_HOLD, 0)
+    for cut in range(len(raw) - 1, stop, -1):
+        if raw[cut] != '-' and raw[cut - 1] != '-' and not raw[cut - 1].isspace():
+            return cut
+    # Only a long run of hyphens and whitespace has no such cut; settle it anyway.
+    return stop
+
+
+def _split_long(text: str, max_length: int) -> List[str]:
+    """Splits `text` into pieces of at most `max_length` characters, at spaces where possible."""
+    pieces = []
+    while len(text) > max_length:
+        cut = text.rfind(' ', 0, max_length + 1)
+        if cut <= 0:
+            cut = max_length
+        pieces.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+class SentenceSegmenter:
+    """
+    Incremental sentence splitter.
+
+    Text can be fed in arbitrary pieces (pages, network reads); a sentence is
+    emitted once the start of the next one has been seen, so abbreviations
+    ("Dr. Smith"), initials and words hyphenated across a break are handled
+    even when they straddle two pieces. Each piece is normalized once: only a
+    short raw tail that the next piece may still change is carried over.
+
+    With `max_length` set, longer sentences are split at spaces, and text
+    without any sentence end is emitted as soon as it grows past that length.
+    """
+
+    def __init__(self, max_length: int | None = None):
+        self.max_length = max_length
+        self._raw = ""
+        self._buffer = ""
+        self._scan = 0
+
+    @staticmethod
+    def _is_abbreviation(text: str, start: int) -> bool:
+        if text[start + 1:start + 2] in '.!?':
+            return False  # "..." or "?!" always end a sentence
+        # Abbreviations are short, so only the last few characters are searched.
+        word_start = text.rfind(' ', max(start - _MAX_WORD, 0), start) + 1
+        if not word_start and start > _MAX_WORD:
+            return False
+        word = text[word_start:start].lstrip(_OPENING).lower()
+        return word in ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+    def _emit(self, sentence: str, sentences: List[str]):
+        if self.max_length and len(sentence) > self.max_length:
+            sentences.extend(_split_long(sentence, self.max_length))
+        elif sentence:
+            sentences.append(sentence)
+
+    def _segment(self, raw: str) -> List[str]:
+        buffer = self._buffer + _normalize(raw)
+        max_length = self.max_length or len(buffer)
+        sentences = []
+        position = 0
+        for match in _BOUNDARY.finditer(buffer, self._scan):
+            end = match.end()
+            if buffer[end].islower():
+                continue
+            start = match.start()
+            if buffer[start] == '.' and self._is_abbreviation(buffer, start):
+                continue
+            # Inlined `_emit`: this loop runs once per sentence.
+            sentence = buffer[position:end].strip()
+            if len(sentence) > max_length:
+                sentences.extend(_split_long(sentence, max_length))
+            elif sentence:
+                sentences.append(sentence)
+            position = end
+
+        # No sentence end in sight: don't let the pending text grow without bound.
+        while len(buffer) - position > max_length:
+            if buffer[position] == ' ':
+                position += 1
+                continue
+            cut = buffer.rfind(' ', position + 1, position + max_length + 1)
+            if cut < 0:
+                cut = position + max_length
+            self._emit(buffer[position:cut].strip(), sentences)
+            position = cut
+
+        self._buffer = buffer[position:]
+        # Anything before a trailing run of terminators has already been
+        # scanned; only that run can still turn into a boundary.
+        scan = len(self._buffer)
+        while scan and self._buffer[scan - 1].isspace():
+            scan -= 1
+        while scan and self._buffer[scan - 1] in _TRAILING:
+            scan -= 1
+        self._scan = scan
+        return sentences
+
+    def feed(self, text: str) -> List[str]:
+        raw = self._raw + text
+        settled = _settled_length(raw)
+        self._raw = raw[settled:]
+        return self._segment(raw[:settled])
+
+    def close(self) -> List[str]:
+        sentences = self._segment(self._raw)
+        self._emit(self._buffer.strip(), sentences)
+        self._raw = self._buffer = ""
+        self._scan = 0
+        return sentences
+
+
+class TextChunker:
+    """Packs sentences into chunks of at most `chunk_size` characters; longer sentences are split."""
+
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self._segmenter = SentenceSegmenter(chunk_size)
+        self._parts = []
+        # Length of the joined parts; -1 for none, so that each part adds its separator.
+        self._length = -1
+
+    def _add(self, sentences: List[str]) -> List[str]:
+        chunks = []
+        parts, length, chunk_size = self._parts, self._length, self.chunk_size
+        for sentence in sentences:
+            if parts and length + 1 + len(sentence) > chunk_size:
+                chunks.append(" ".join(parts))
+                parts, length = [], -1
+            length += len(sentence) + 1
+            parts.append(sentence)
+        self._parts, self._length = parts, length
+        return chunks
+
+    def feed(self, text: str) -> List[str]:
+        return self._add(self._segmenter.feed(text))
+
+    def close(self) -> List[str]:
+        chunks = self._add(self._segmenter.close())
+        if self._parts:
+            chunks.append(" ".join(self._parts))
+            self._parts, self._length = [], -1
+        return chunks
+
+
+def iter_text_chunks(text: str, chunk_size: int = 300, piece_size: int = 64 * 1024) -> Iterator[str]:
+    """Segments `text` a piece at a time, so the first chunks are ready before the rest is scanned."""
+    chunker = TextChunker(chunk_size)
+    for start in range(0, len(text), piece_size):
+        yield from chunker.feed(text[start:start + piece_size])
+    yield from chunker.close()
+
+
+def chunk_text(text: str, chunk_size: int = 300) -> List[str]:
+    return list(iter_text_chunks(text, chunk_size))
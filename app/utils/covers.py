@@ -0,0 +1,151 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from const import COVER_WORKERS, COVER_WEBP, COVER_CLAIM_SECONDS, COVER_RETRY_SECONDS
+from .pdf_utils import first_page_image
+from .shared_cache import shared_store
+import logging
+import os
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+# Target widths in pixels; "full" is stored at the book's original img_path.
+COVER_SIZES = {"thumb": 150, "medium": 400, "full": 1000}
+COVER_FORMATS = {"jpeg": "image/jpeg", "webp": "image/webp"}
+PLACEHOLDER_COLOR = (224, 224, 224)
+
+
+def cover_variant_path(img_path: str, size: str = "full", fmt: str = "jpeg") -> str:
+    if size == "full" and fmt == "jpeg":
+        return img_path
+    base, _ = os.path.splitext(img_path)
+    return f"{base}_{size}.{fmt}"
+
+def cover_variants(img_path: str, webp: bool = COVER_WEBP) -> list[str]:
+    formats = ["jpeg", "webp"] if webp else ["jpeg"]
+    return [cover_variant_path(img_path, size, fmt) for size in COVER_SIZES for fmt in formats]
+
+def cover_files(img_path: str) -> list[str]:
+    """All cover files of a book that exist on disk, in any format."""
+    return [path for path in cover_variants(img_path, webp=True) if os.path.exists(path)]
+
+def _save(image, path: str, fmt: str, pdf_path: str) -> bool:
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    if fmt == "jpeg":
+        image.save(tmp_path, format="JPEG", quality=85, optimize=True, progressive=True)
+    else:
+        image.save(tmp_path, format="WEBP", quality=80, method=4)
+    if not os.path.exists(pdf_path):
+        # The book was deleted while its cover was rendering.
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+def _remove(paths: list[str]):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class CoverRenderer:
+    """
+    Renders cover variants off the request path.
+
+    The first page is rasterized once, at the width of the largest variant
+    rather than at a fixed DPI, and downscaled for the smaller sizes. A cover
+    that fails to render is not retried for `retry_seconds`.
+    """
+
+    def __init__(self, workers: int, webp: bool, retry_seconds: float):
+        self.webp = webp
+        self.retry_seconds = retry_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="covers")
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def is_pending(self, img_path: str) -> bool:
+        with self._lock:
+            return img_path in self._pending
+
+    def _failed(self, img_path: str) -> bool:
+        try:
+            return shared_store.get(f"cover_failed:{img_path}") is not None
+        except Exception:
+            return False
+
+    def submit(self, pdf_path: str, img_path: str):
+        if self._failed(img_path):
+            return
+        with self._lock:
+            if img_path in self._pending:
+                return
+            self._pending.add(img_path)
+        if not self._claim(img_path):
+            # Another worker is already rendering this cover.
+            with self._lock:
+                self._pending.discard(img_path)
+            return
+        self._executor.submit(self._render, pdf_path, img_path)
+
+    def _claim(self, img_path: str) -> bool:
+        try:
+            return shared_store.add(f"cover:{img_path}", b"1", COVER_CLAIM_SECONDS)
+        except Exception as e:
+            logger.warning("Could not claim cover %s, rendering anyway: %s", img_path, e)
+            return True
+
+    def _render(self, pdf_path: str, img_path: str):
+        try:
+            from PIL import Image
+            page = first_page_image(pdf_path, size=(COVER_SIZES["full"], None)).convert("RGB")
+            formats = ["jpeg", "webp"] if self.webp else ["jpeg"]
+            saved = []
+            # Smallest first so library grids get their thumbnails soonest.
+            for size, width in sorted(COVER_SIZES.items(), key=lambda item: item[1]):
+                image = page
+                if page.width > width:
+                    image = page.resize((width, round(page.height * width / page.width)), Image.LANCZOS)
+                for fmt in formats:
+                    path = cover_variant_path(img_path, size, fmt)
+                    if not _save(image, path, fmt, pdf_path):
+                        _remove(saved)
+                        return
+                    saved.append(path)
+            if not os.path.exists(pdf_path):
+                _remove(saved)
+        except Exception as e:
+            logger.error("Failed to render cover for %s: %s", pdf_path, e)
+            try:
+                shared_store.set(f"cover_failed:{img_path}", str(e).encode(), self.retry_seconds)
+            except Exception:
+                pass
+        finally:
+            try:
+                shared_store.delete(f"cover:{img_path}")
+            except Exception:
+                pass  # The claim expires on its own.
+            with self._lock:
+                self._pending.discard(img_path)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_placeholders = {}
+
+def placeholder(size: str, fmt: str) -> bytes:
+    key = (size, fmt)
+    if key not in _placeholders:
+        from PIL import Image
+        width = COVER_SIZES[size]
+        buffer = BytesIO()
+        Image.new("RGB", (width, round(width * 11 / 8.5)), PLACEHOLDER_COLOR).save(buffer, format=fmt.upper())
+        _placeholders[key] = buffer.getvalue()
+    return _placeholders[key]
+
+
+cover_renderer = CoverRenderer(COVER_WORKERS, COVER_WEBP, COVER_RETRY_SECONDS)
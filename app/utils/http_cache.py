@@ -0,0 +1,63 @@
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request
+from fastapi.responses import Response
+from .text_cache import file_identity
+import hashlib
+import os
+
+
+# Used when the URL pins the content version (the `v` query parameter), so
+# the response for that URL can never change.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+def book_version(book) -> str:
+    """Identifies the content of a book's file; changes whenever the bytes do."""
+    if book.content_hash:
+        return book.content_hash
+    mtime, size = file_identity(book.file_path)
+    return f"{mtime:x}-{size:x}"
+
+def cache_headers(etag: str, mtime: float, immutable: bool = False) -> dict:
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+    }
+
+def book_cache_headers(book, resource: str, version: str | None = None) -> dict:
+    current = book_version(book)
+    return cache_headers(
+        make_etag(current, resource),
+        os.path.getmtime(book.file_path),
+        immutable=version == current,
+    )
+
+def file_cache_headers(path: str, immutable: bool = False) -> dict:
+    mtime, size = file_identity(path)
+    return cache_headers(make_etag(os.path.abspath(path), mtime, size), mtime / 1e9, immutable)
+
+def is_not_modified(request: Request, headers: dict) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match uses weak comparison, so W/ prefixes are ignored.
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or headers["ETag"] in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+            modified = parsedate_to_datetime(headers["Last-Modified"])
+        except (TypeError, ValueError):
+            return False
+        return modified <= since
+    return False
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
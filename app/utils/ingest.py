@@ -0,0 +1,210 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable
+from const import INGEST_WORKERS, INGEST_BATCH_PAGES, INGEST_CHUNK_SIZE
+from .pdf_utils import chunk_text, count_pages, ocr_blank_pages
+from .text_cache import page_text_cache, file_identity
+from .shared_cache import shared_store
+import json
+import logging
+import multiprocessing
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+def extract_page_range(path: str, start: int, end: int) -> list[str]:
+    from PyPDF2 import PdfReader
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+class IngestionPipeline:
+    """
+    Extracts, normalizes and chunks every page of a book in the background.
+
+    Page text lands in the page text cache, the page count in the book's
+    "manifest" artifact and the per-page chunks in its "chunks" artifact.
+    Pages without a text layer are OCR'd when OCR is available.
+
+    The status of running jobs is published to the shared store, so that any
+    worker can report it; finished books are recognized by their artifacts.
+    """
+
+    # Published statuses of jobs whose worker died expire after this long.
+    status_ttl = 24 * 3600
+
+    def __init__(self, workers: int, batch_pages: int, chunk_size: int):
+        self.workers = workers
+        self.batch_pages = batch_pages
+        self.chunk_size = chunk_size
+        self._status = {}
+        self._callbacks = {}
+        self._lock = threading.Lock()
+        self._processes = None
+        self._coordinators = None
+
+    def _pools(self):
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._coordinators = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+            return self._processes, self._coordinators
+
+    def _publish(self, path: str, status: dict | None):
+        try:
+            if status is None:
+                shared_store.delete(f"ingest:{path}")
+            else:
+                shared_store.set(f"ingest:{path}", json.dumps(status).encode(), self.status_ttl)
+        except Exception as e:
+            logger.warning("Could not publish the ingestion status of %s: %s", path, e)
+
+    def _update(self, path: str, **fields) -> bool:
+        with self._lock:
+            status = self._status.get(path)
+            if status is None:
+                return False
+            status.update(fields)
+            status = dict(status)
+        self._publish(path, status)
+        return True
+
+    def submit(self, path: str, on_done: Callable[[str], None] | None = None):
+        """Ingests a book unless that's already done or underway; `on_done(path)` runs once it is ingested."""
+        with self._lock:
+            current = self._status.get(path)
+            if current and current["status"] in ("queued", "running"):
+                if on_done is not None:
+                    self._callbacks.setdefault(path, []).append(on_done)
+                return
+        if current is None:
+            # Another worker may be ingesting it, but it can't call `on_done`: ingest it here too.
+            current = self.status(path)
+        if current and current["status"] == "done":
+            # Already ingested, possibly for another upload of the same content.
+            if on_done is not None:
+                on_done(path)
+            return
+        status = {"status": "queued", "pages_done": 0, "pages_total": None, "pages_ocr": 0, "error": None}
+        with self._lock:
+            self._status[path] = dict(status)
+            if on_done is not None:
+                self._callbacks.setdefault(path, []).append(on_done)
+        self._publish(path, status)
+        processes, coordinators = self._pools()
+        coordinators.submit(self._ingest, path, processes)
+
+    def _ingest(self, path: str, processes: ProcessPoolExecutor):
+        try:
+            identity = file_identity(path)
+            total = count_pages(path)
+            if not self._update(path, status="running", pages_total=total):
+                return
+            page_text_cache.put_artifact(path, "manifest", {"pages": total}, identity)
+
+            futures = [
+                (start, processes.submit(extract_page_range, path, start, min(start + self.batch_pages, total)))
+                for start in range(0, total, self.batch_pages)
+            ]
+            pages = [""] * total
+            done = 0
+            # Batches are awaited in order rather than with as_completed: futures
+            # cancelled by a pool shutdown never wake as_completed up.
+            for start, future in futures:
+                texts = future.result()
+                done += len(texts)
+                if not self._update(path, pages_done=done):
+                    for _, pending in futures:
+                        pending.cancel()
+                    return
+                for offset, text in enumerate(texts):
+                    pages[start + offset] = text
+                    page_text_cache.put(path, start + offset, text, identity)
+
+            # Scanned pages have no text layer; OCR them before chunking.
+            blank = {page_num: text for page_num, text in enumerate(pages) if not text.strip()}
+            if blank:
+                ocr_pages = 0
+                for page_num, (text, source) in ocr_blank_pages(path, blank, identity).items():
+                    pages[page_num] = text
+                    ocr_pages += source == "ocr"
+                if ocr_pages:
+                    self._update(path, pages_ocr=ocr_pages)
+                    page_text_cache.put_artifact(path, "manifest", {"pages": total, "pages_ocr": ocr_pages}, identity)
+
+            # chunk_text normalizes as it segments.
+            chunks = [chunk_text(text, self.chunk_size) for text in pages]
+            page_text_cache.put_artifact(path, "chunks", {"chunk_size": self.chunk_size, "pages": chunks}, identity)
+            if self._update(path, status="done"):
+                logger.info("Ingested %s pages of %s", total, path)
+                self._notify(path)
+            else:
+                page_text_cache.invalidate(path)
+        except Exception as e:
+            with self._lock:
+                self._callbacks.pop(path, None)
+            # A book deleted mid-ingestion is no longer tracked; don't report it.
+            if self._update(path, status="failed", error=str(e)):
+                logger.error("Failed to ingest %s: %s", path, e)
+
+    def _notify(self, path: str):
+        with self._lock:
+            callbacks = self._callbacks.pop(path, [])
+        for callback in callbacks:
+            try:
+                callback(path)
+            except Exception as e:
+                logger.error("Ingestion callback failed for %s: %s", path, e)
+
+    def status(self, path: str) -> dict | None:
+        with self._lock:
+            status = self._status.get(path)
+            if status is not None:
+                return dict(status)
+        try:
+            published = shared_store.get(f"ingest:{path}")
+        except Exception:
+            published = None
+        if published is not None:
+            return json.loads(published)
+        # Fall back to the persisted artifacts, e.g. after a restart.
+        try:
+            manifest = page_text_cache.get_artifact(path, "manifest")
+            chunks = page_text_cache.get_artifact(path, "chunks")
+        except OSError:
+            return None
+        if manifest is None or chunks is None:
+            return None
+        return {
+            "status": "done",
+            "pages_done": manifest["pages"],
+            "pages_total": manifest["pages"],
+            "pages_ocr": manifest.get("pages_ocr", 0),
+            "error": None,
+        }
+
+    def forget(self, path: str):
+        with self._lock:
+            self._status.pop(path, None)
+            self._callbacks.pop(path, None)
+        self._publish(path, None)
+
+    def shutdown(self):
+        with self._lock:
+            if self._processes is not None:
+                self._coordinators.shutdown(wait=False, cancel_futures=True)
+                self._processes.shutdown(wait=False, cancel_futures=True)
+                self._processes = self._coordinators = None
+            # Untracked books are not reported as failed by their coordinators.
+            unfinished = [path for path, status in self._status.items() if status["status"] in ("queued", "running")]
+            self._status.clear()
+            self._callbacks.clear()
+        for path in unfinished:
+            self._publish(path, None)
+
+
+ingestion = IngestionPipeline(INGEST_WORKERS, INGEST_BATCH_PAGES, INGEST_CHUNK_SIZE)
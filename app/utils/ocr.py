@@ -0,0 +1,84 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from const import OCR_ENABLED, OCR_WORKERS, OCR_DPI, OCR_LANG
+import logging
+import multiprocessing
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+def ocr_page(path: str, page_num: int, dpi: int, lang: str) -> str:
+    # Runs in a worker process: rasterize just this page and OCR it.
+    from pdf2image import convert_from_path
+    import pytesseract
+    images = convert_from_path(path, first_page=page_num + 1, last_page=page_num + 1, dpi=dpi, grayscale=True)
+    if not images:
+        return ""
+    return pytesseract.image_to_string(images[0], lang=lang)
+
+
+class OcrPool:
+    """
+    OCRs pages without a text layer on a process pool.
+
+    Requests for a page that is already being OCR'd share the same future,
+    so concurrent readers of a scanned book don't OCR a page twice.
+    """
+
+    def __init__(self, enabled: bool, workers: int, dpi: int, lang: str):
+        self.enabled = enabled
+        self.workers = workers
+        self.dpi = dpi
+        self.lang = lang
+        self._available = None
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        if self._available is None:
+            self._available = self.enabled and self._has_tesseract()
+        return self._available
+
+    @staticmethod
+    def _has_tesseract() -> bool:
+        # pytesseract is optional and only imported once OCR is first needed.
+        try:
+            import pytesseract
+            pytesseract.get_tesseract_version()
+        except Exception as e:
+            logger.warning("OCR disabled, tesseract is not usable: %s", e)
+            return False
+        return True
+
+    def submit(self, path: str, page_num: int) -> Future:
+        key = (path, page_num)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            future = self._executor.submit(ocr_page, path, page_num, self.dpi, self.lang)
+            self._pending[key] = future
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key: tuple):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            self._pending.clear()
+
+
+ocr_pool = OcrPool(OCR_ENABLED, OCR_WORKERS, OCR_DPI, OCR_LANG)
@@ -0,0 +1,38 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+from const import STREAM_WORKERS, STREAM_READ_AHEAD
+from .pdf_utils import page_text
+
+
+class PageStreamer:
+    """
+    Extracts consecutive pages of a book on a shared thread pool, keeping at
+    most `read_ahead` pages in flight per stream so memory stays bounded no
+    matter how long the book is.
+    """
+
+    def __init__(self, workers: int, read_ahead: int):
+        self.read_ahead = max(1, read_ahead)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="page-stream")
+
+    def pages(self, path: str, start: int, stop: int) -> Iterator[tuple[int, str, str]]:
+        pending = deque()
+        next_page = start
+        try:
+            while pending or next_page < stop:
+                while next_page < stop and len(pending) < self.read_ahead:
+                    pending.append((next_page, self._executor.submit(page_text, path, next_page)))
+                    next_page += 1
+                page_num, future = pending.popleft()
+                yield page_num, *future.result()
+        finally:
+            # The consumer went away (e.g. client disconnect): drop what's queued.
+            for _, future in pending:
+                future.cancel()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+page_streamer = PageStreamer(STREAM_WORKERS, STREAM_READ_AHEAD)
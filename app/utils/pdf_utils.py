@@ -1,80 +1,162 @@
-from PyPDF2 import PdfReader
+# PyPDF2 and pdf2image are imported on first use to keep startup fast.
+from concurrent.futures import Future, wait
+from functools import partial
 from typing import Dict, Any
+from const import OCR_WAIT_SECONDS
 from fastapi import HTTPException
-from pdf2image import convert_from_path
-import regex as re
 from typing import List
 import os
+import logging
 from io import BytesIO
+from .text_cache import page_text_cache, file_identity
+from .reader_pool import reader_pool
+from .chunking import chunk_text, iter_text_chunks, normalize_text
+from .ocr import ocr_pool
+from .metrics import track
+
+
+logger = logging.getLogger(__name__)
 
 
 def delete_file(file_path: str) -> bool:
     try:
         os.remove(file_path)
         return True
-    except OSError as e:
+    except OSError:
         return False
     
-def chunk_text(text: str, chunk_size: int = 300) -> List[str]:
-    sentences = re.split(r'(?<=[.!?]) +', text)
-    chunks = []
-    current_chunk = ""
-
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) + 1 <= chunk_size:
-            if current_chunk:
-                current_chunk += " " + sentence
-            else:
-                current_chunk = sentence
-        else:
-            if current_chunk:
-                chunks.append(current_chunk)
-            current_chunk = sentence
-
-    if current_chunk:
-        chunks.append(current_chunk)
-
-    return chunks
-
 def make_path(media_path, username, filename):
     file_name = f"{username}_{filename}"
     return os.path.join(media_path, file_name)
 
+def make_blob_path(media_path, content_hash, extension):
+    return os.path.join(media_path, f"{content_hash}{extension}")
+
 def pdf_to_text(file, page_num=0):
+    return page_text(file, page_num)[0]
+
+def page_text(file, page_num=0) -> tuple[str, str]:
+    """
+    Text of a page and where it came from: "text" for the PDF's text layer,
+    "ocr" when the page has none and was OCR'd instead.
+    """
     try:
         page_num = int(page_num)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid page number")
-    reader = PdfReader(file)
-    text = ""
+    if not isinstance(file, str):
+        from PyPDF2 import PdfReader
+        return _page_text(PdfReader(file), page_num), "text"
+    return pages_to_text(file, [page_num])[page_num]
+
+def pages_to_text(file: str, page_nums: List[int], ocr_wait: float | None = OCR_WAIT_SECONDS) -> Dict[int, tuple[str, str]]:
+    """Texts and sources of several pages of a book, parsing only the uncached ones, under a single reader."""
+    identity = file_identity(file)
+    texts = {}
+    for page_num in page_nums:
+        cached = page_text_cache.get(file, page_num, identity)
+        if cached is not None:
+            texts[page_num] = cached
+    missing = [page_num for page_num in page_nums if page_num not in texts]
+    if missing:
+        with reader_pool.reader(file) as reader:
+            for page_num in missing:
+                texts[page_num] = _page_text(reader, page_num)
+        for page_num in missing:
+            page_text_cache.put(file, page_num, texts[page_num], identity)
+    return ocr_blank_pages(file, texts, identity, ocr_wait)
+
+def ocr_blank_pages(file: str, texts: Dict[int, str], identity: tuple[int, int],
+                    timeout: float | None = None) -> Dict[int, tuple[str, str]]:
+    """
+    Replaces pages without a text layer by their OCR'd text, OCR-ing each
+    page at most once. Pages whose OCR takes longer than `timeout` keep their
+    text layer with source "ocr_pending" and are cached once OCR finishes;
+    pages whose OCR failed get source "ocr_failed".
+    """
+    results = {page_num: (text, "text") for page_num, text in texts.items()}
+    blank = [page_num for page_num, text in texts.items() if not text.strip()]
+    if not blank or not ocr_pool.available:
+        return results
+    futures = {}
+    for page_num in blank:
+        cached = page_text_cache.get(file, page_num, identity, source="ocr")
+        if cached is not None:
+            results[page_num] = (cached, "ocr")
+        else:
+            future = ocr_pool.submit(file, page_num)
+            future.add_done_callback(partial(_cache_ocr, file, page_num, identity))
+            futures[page_num] = future
+    wait(futures.values(), timeout)
+    for page_num, future in futures.items():
+        if not future.done():
+            results[page_num] = (texts[page_num], "ocr_pending")
+        elif future.cancelled() or future.exception() is not None:
+            results[page_num] = (texts[page_num], "ocr_failed")
+        else:
+            results[page_num] = (future.result(), "ocr")
+    return results
+
+def _cache_ocr(file: str, page_num: int, identity: tuple[int, int], future: Future):
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        logger.error("OCR failed for page %s of %s: %s", page_num, file, future.exception())
+        return
+    page_text_cache.put(file, page_num, future.result(), identity, source="ocr")
+
+def _page_text(reader, page_num: int) -> str:
     if 0 <= page_num < len(reader.pages):
-        page = reader.pages[page_num]
-        text = page.extract_text() if page.extract_text() else ""
-    else:
-        raise HTTPException(status_code=400, detail="Invalid page number")
-    return text
+        with track("text_extract"):
+            return reader.pages[page_num].extract_text() or ""
+    raise HTTPException(status_code=400, detail="Invalid page number")
 
 def extract_metadata(file: str) -> Dict[str, Any]:
-    reader = PdfReader(file)
-    metadata = reader.metadata
+    if isinstance(file, str):
+        return reader_pool.metadata(file)
+    from PyPDF2 import PdfReader
+    metadata = PdfReader(file).metadata or {}
     metadata_dict = {key: metadata[key] for key in metadata.keys()}
     return metadata_dict
 
+def read_upload_metadata(file_path: str) -> Dict[str, Any]:
+    """Metadata of an uploaded file, which is parsed outside the reader pool; 400 if it isn't a readable PDF."""
+    try:
+        with open(file_path, 'rb') as f:
+            return extract_metadata(f)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid PDF file: {e}")
+
 def get_pages(file):
+    from PyPDF2 import PdfReader
     return PdfReader(file).pages
 
-def first_page_jpeg(file_path: str, dpi=300) -> BytesIO:
+def count_pages(file) -> int:
+    if isinstance(file, str):
+        return reader_pool.page_count(file)
+    return len(get_pages(file))
+
+def first_page_image(file_path: str, dpi=300, size=None):
+    from pdf2image import convert_from_path
     try:
         # Convert only the first page of the PDF
-        images = convert_from_path(file_path, first_page=1, last_page=1, dpi=dpi)
-        if images:
-            img = images[0]
-            img_byte_arr = BytesIO()
-            img.save(img_byte_arr, format='JPEG')
-            img_byte_arr.seek(0)
-            return img_byte_arr
-        else:
-            raise HTTPException(status_code=500, detail="Failed to convert PDF to image")
+        with track("image_render"):
+            images = convert_from_path(file_path, first_page=1, last_page=1, dpi=dpi, size=size)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred during PDF conversion: {e}")
+    if not images:
+        raise HTTPException(status_code=500, detail="Failed to convert PDF to image")
+    return images[0]
 
+def preload():
+    """Imports the PDF and image libraries ahead of the first request that needs them."""
+    import PyPDF2
+    import pdf2image
+    import PIL.Image
+
+def first_page_jpeg(file_path: str, dpi=300) -> BytesIO:
+    img = first_page_image(file_path, dpi)
+    img_byte_arr = BytesIO()
+    img.save(img_byte_arr, format='JPEG')
+    img_byte_arr.seek(0)
+    return img_byte_arr
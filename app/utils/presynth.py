@@ -0,0 +1,206 @@
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from const import PRESYNTH_WORKERS, PRESYNTH_WINDOW, PRESYNTH_PER_USER, PRESYNTH_IDLE_SECONDS, INGEST_CHUNK_SIZE
+from .audio_cache import audio_key
+from .pdf_utils import chunk_text, count_pages, pdf_to_text
+from .text_cache import page_text_cache
+from .tts import cached_audio, synthesize
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+def upcoming_chunks(file_path: str, page: int, chunk: int, count: int) -> list[str]:
+    """The next `count` TTS chunks of a book from a position, continuing onto later pages."""
+    artifact = page_text_cache.get_artifact(file_path, "chunks")
+    pages_num = len(artifact["pages"]) if artifact else count_pages(file_path)
+    chunks = []
+    while len(chunks) < count and page < pages_num:
+        if artifact:
+            page_chunks = artifact["pages"][page]
+        else:
+            page_chunks = chunk_text(pdf_to_text(file_path, page), INGEST_CHUNK_SIZE)
+        chunks.extend(page_chunks[chunk:chunk + count - len(chunks)])
+        page, chunk = page + 1, 0
+    return chunks
+
+
+class Listener:
+    def __init__(self, username: str):
+        self.username = username
+        self.book = None
+        self.page = None
+        self.chunk = None
+        # Bumped on every jump; in-flight work of an older generation stops.
+        self.generation = 0
+        self.queue = deque()
+        self.last_seen = time.monotonic()
+
+
+class PreSynthesizer:
+    """
+    Keeps the next `window` chunks after each listener's position synthesized.
+
+    Workers take jobs from listeners in round-robin order so one listener
+    can't starve the others, and a listener never has more than `per_user`
+    jobs running. Jumping to another page or book drops the listener's queue
+    and stops its running jobs. Listeners that report no position for
+    `idle_seconds` are forgotten.
+    """
+
+    def __init__(self, workers: int, window: int, per_user: int, idle_seconds: float):
+        self.workers = workers
+        self.window = window
+        self.per_user = per_user
+        self.idle_seconds = idle_seconds
+        self._last_sweep = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="presynth")
+        self._lock = threading.Lock()
+        self._listeners = {}
+        self._rotation = deque()
+        self._running = {}
+        self._running_per_user = Counter()
+        self._metrics = Counter()
+
+    def update(self, username: str, book: str, file_path: str, page: int, chunk: int,
+               model_name: str, voice: str, model_keys: dict | None = None) -> int:
+        """Moves a listener to a position and schedules the chunks after it; returns how many were queued."""
+        texts = upcoming_chunks(file_path, page, chunk + 1, self.window)
+        jobs = []
+        for text in texts:
+            key, cached_path = cached_audio(text, model_name, voice, model_keys)
+            if cached_path is None:
+                jobs.append((key, text, model_name, voice, model_keys))
+
+        with self._lock:
+            listener = self._listeners.get(username)
+            if listener is None:
+                listener = self._listeners[username] = Listener(username)
+            jumped = (
+                listener.book != book
+                or listener.page != page
+                or chunk < listener.chunk
+                or chunk > listener.chunk + self.window
+            )
+            if jumped and listener.book is not None:
+                listener.generation += 1
+                self._metrics["cancelled"] += len(listener.queue)
+            listener.book, listener.page, listener.chunk = book, page, chunk
+            listener.last_seen = time.monotonic()
+            self._evict_idle(listener.last_seen)
+            listener.queue = deque(job for job in jobs if job[0] not in self._running)
+            scheduled = len(listener.queue)
+            self._metrics["scheduled"] += scheduled
+            if listener.queue and username not in self._rotation:
+                self._rotation.append(username)
+            self._dispatch()
+            return scheduled
+
+    def stop(self, username: str):
+        with self._lock:
+            listener = self._listeners.pop(username, None)
+            if listener is not None:
+                listener.generation += 1
+                self._metrics["cancelled"] += len(listener.queue)
+                listener.queue.clear()
+
+    def _evict_idle(self, now: float):
+        # Called with the lock held; sweeps at most a few times per idle period.
+        if now - self._last_sweep < self.idle_seconds / 4:
+            return
+        self._last_sweep = now
+        for username, listener in list(self._listeners.items()):
+            if now - listener.last_seen >= self.idle_seconds and not self._running_per_user[username]:
+                del self._listeners[username]
+                self._metrics["cancelled"] += len(listener.queue)
+                listener.queue.clear()
+
+    def _dispatch(self):
+        # Called with the lock held.
+        skipped = 0
+        while len(self._running) < self.workers and len(self._rotation) > skipped:
+            username = self._rotation.popleft()
+            listener = self._listeners.get(username)
+            if listener is None or not listener.queue:
+                continue
+            if self._running_per_user[username] >= self.per_user:
+                self._rotation.append(username)
+                skipped += 1
+                continue
+            job = listener.queue.popleft()
+            if job[0] in self._running:
+                # Another listener is already synthesizing the same chunk.
+                self._rotation.appendleft(username)
+                continue
+            self._running[job[0]] = self._executor.submit(self._synthesize, listener, listener.generation, job)
+            self._running_per_user[username] += 1
+            if listener.queue:
+                self._rotation.append(username)
+            skipped = 0
+
+    def _synthesize(self, listener: Listener, generation: int, job: tuple):
+        key, text, model_name, voice, model_keys = job
+        try:
+            stream = synthesize(text, model_name, voice, model_keys)
+            for _ in stream:
+                if listener.generation != generation:
+                    stream.close()
+                    with self._lock:
+                        self._metrics["cancelled"] += 1
+                    return
+            with self._lock:
+                self._metrics["completed"] += 1
+        except Exception as e:
+            logger.error("Pre-synthesis failed for %s: %s", listener.username, e)
+            with self._lock:
+                self._metrics["failed"] += 1
+        finally:
+            with self._lock:
+                self._running.pop(key, None)
+                self._running_per_user[listener.username] -= 1
+                if self._running_per_user[listener.username] <= 0:
+                    del self._running_per_user[listener.username]
+                if listener.queue and listener.username not in self._rotation:
+                    self._rotation.append(listener.username)
+                self._dispatch()
+
+    def running(self, text: str, model_name: str, voice: str, model_keys: dict | None = None) -> Future | None:
+        """The job currently synthesizing this chunk, if any, so a request can wait for it."""
+        with self._lock:
+            return self._running.get(audio_key(text, model_name, voice, model_keys))
+
+    def record_playback(self, ready: bool):
+        # A chunk that wasn't synthesized by the time the listener asked for it is an underrun.
+        with self._lock:
+            self._metrics["requests"] += 1
+            if not ready:
+                self._metrics["underruns"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self._metrics["requests"]
+            return {
+                "listeners": len(self._listeners),
+                "running": len(self._running),
+                "queued": sum(len(listener.queue) for listener in self._listeners.values()),
+                "scheduled": self._metrics["scheduled"],
+                "completed": self._metrics["completed"],
+                "cancelled": self._metrics["cancelled"],
+                "failed": self._metrics["failed"],
+                "requests": requests,
+                "underruns": self._metrics["underruns"],
+                "underrun_rate": self._metrics["underruns"] / requests if requests else 0.0,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            for listener in self._listeners.values():
+                listener.generation += 1
+                listener.queue.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+presynthesizer = PreSynthesizer(PRESYNTH_WORKERS, PRESYNTH_WINDOW, PRESYNTH_PER_USER, PRESYNTH_IDLE_SECONDS)
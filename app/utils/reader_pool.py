@@ -0,0 +1,172 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from const import READER_POOL_MAX_HANDLES, READER_POOL_MAX_BYTES, READER_POOL_READERS_PER_FILE
+from .text_cache import file_identity
+from .metrics import track
+import mmap
+import os
+import threading
+
+
+class _PooledReader:
+    def __init__(self, path: str, identity: tuple[int, int]):
+        from PyPDF2 import PdfReader
+        self._file = open(path, 'rb')
+        self._map = None
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.reader = PdfReader(self._map)
+            self.page_count = len(self.reader.pages)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class _PooledFile:
+    def __init__(self, identity: tuple[int, int]):
+        self.identity = identity
+        self.size = identity[1]
+        self.idle = []
+        self.metadata = None
+
+
+class ReaderPool:
+    """
+    Bounded LRU pool of parsed PdfReader objects over memory-mapped files.
+
+    Readers are not thread-safe, so each one is lent to a single caller at a
+    time through `reader()`. Concurrent reads of the same book parse extra
+    readers rather than queueing for one, and up to `readers_per_file` of
+    them are kept for reuse. The pool is capped both by the number of idle
+    readers and by the total size of the mapped files.
+    """
+
+    def __init__(self, max_handles: int, max_bytes: int, readers_per_file: int):
+        self.max_handles = max_handles
+        self.max_bytes = max_bytes
+        self.readers_per_file = readers_per_file
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._idle = 0
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _pop(self, key: str) -> list[_PooledReader]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return []
+        self._bytes -= entry.size
+        self._idle -= len(entry.idle)
+        readers, entry.idle = entry.idle, []
+        return readers
+
+    def _trim(self) -> list[_PooledReader]:
+        stale = []
+        while len(self._entries) > 1 and (self._idle > self.max_handles or self._bytes > self.max_bytes):
+            stale.extend(self._pop(next(iter(self._entries))))
+        return stale
+
+    def _take(self, key: str, path: str) -> tuple[_PooledFile, _PooledReader]:
+        identity = file_identity(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            stale = []
+            if entry is not None and entry.identity != identity:
+                stale = self._pop(key)
+                entry = None
+            if entry is None:
+                entry = _PooledFile(identity)
+                self._entries[key] = entry
+                self._bytes += entry.size
+                stale.extend(self._trim())
+            self._entries.move_to_end(key)
+            self._in_use += 1
+            if entry.idle:
+                self._idle -= 1
+                self.hits += 1
+                pooled = entry.idle.pop()
+            else:
+                self.misses += 1
+                pooled = None
+
+        for old in stale:
+            old.close()
+        if pooled is None:
+            try:
+                # Parse outside the pool lock so one large book doesn't stall the rest.
+                with track("pdf_parse"):
+                    pooled = _PooledReader(path, identity)
+            except BaseException:
+                with self._lock:
+                    self._in_use -= 1
+                    # Don't keep an entry for a file that can't be parsed.
+                    if self._entries.get(key) is entry and not entry.idle:
+                        self._pop(key)
+                raise
+        return entry, pooled
+
+    def _give_back(self, key: str, entry: _PooledFile, pooled: _PooledReader):
+        stale = [pooled]
+        with self._lock:
+            self._in_use -= 1
+            # Readers of a file that was replaced or evicted meanwhile are dropped.
+            if self._entries.get(key) is entry and len(entry.idle) < self.readers_per_file:
+                entry.idle.append(pooled)
+                self._idle += 1
+                stale = self._trim()
+        for old in stale:
+            old.close()
+
+    @contextmanager
+    def _borrow(self, path: str):
+        key = os.path.abspath(path)
+        entry, pooled = self._take(key, path)
+        try:
+            yield entry, pooled
+        finally:
+            self._give_back(key, entry, pooled)
+
+    @contextmanager
+    def reader(self, path: str):
+        with self._borrow(path) as (_, pooled):
+            yield pooled.reader
+
+    def page_count(self, path: str) -> int:
+        with self._borrow(path) as (_, pooled):
+            return pooled.page_count
+
+    def metadata(self, path: str) -> dict:
+        with self._borrow(path) as (entry, pooled):
+            if entry.metadata is None:
+                metadata = pooled.reader.metadata or {}
+                entry.metadata = {key: metadata[key] for key in metadata.keys()}
+            return dict(entry.metadata)
+
+    def evict(self, path: str):
+        with self._lock:
+            stale = self._pop(os.path.abspath(path))
+        for old in stale:
+            old.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "files": len(self._entries),
+                "handles": self._idle,
+                "in_use": self._in_use,
+                "max_handles": self.max_handles,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+reader_pool = ReaderPool(READER_POOL_MAX_HANDLES, READER_POOL_MAX_BYTES, READER_POOL_READERS_PER_FILE)
@@ -0,0 +1,164 @@
+"""
+Full-text search over the pages of each user's books, backed by SQLite FTS5.
+
+The index lives in its own SQLite file (SEARCH_INDEX_PATH) whatever the main
+database is. Books are indexed once ingestion has cached their page text and
+removed when they are deleted. Run `python -m utils.search` from the app
+directory to index books uploaded before the index existed.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from const import SEARCH_INDEX_PATH
+from .pdf_utils import count_pages, pages_to_text
+from .text_cache import page_text_cache
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+_TERM = re.compile(r'\w+')
+# Page rows get rowid (book id << _PAGE_BITS) | page.
+_PAGE_BITS = 20
+_PAGE_MASK = (1 << _PAGE_BITS) - 1
+
+
+def owner_token(owner: str) -> str:
+    # Usernames may contain anything; a hex token always survives tokenization.
+    return "o" + hashlib.sha1(owner.encode()).hexdigest()[:16]
+
+def match_query(owner: str, query: str) -> str | None:
+    """FTS5 query for all terms of `query`, the last one as a prefix, in the owner's books."""
+    terms = _TERM.findall(query)
+    if not terms:
+        return None
+    text = " ".join(f'"{term}"' for term in terms) + "*"
+    return f'owner:{owner_token(owner)} AND text:({text})'
+
+
+class SearchIndex:
+    def __init__(self, db_path: str | None):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-index")
+        self._schema_ready = False
+
+    def _connection(self) -> sqlite3.Connection:
+        if not self.db_path:
+            raise HTTPException(status_code=503, detail="Search is not configured")
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._schema_ready:
+            with self._write_lock, conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS books (id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT UNIQUE NOT NULL)")
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5("
+                    "text, owner, tokenize='unicode61 remove_diacritics 2')"
+                )
+                self._schema_ready = True
+        return conn
+
+    @staticmethod
+    def _book_exists(book: str) -> bool:
+        # Imported here: the database layer imports this module.
+        from db.database import SessionLocal
+        from db.models import Book
+
+        with SessionLocal() as db:
+            return db.query(Book.path).filter(Book.path == book).first() is not None
+
+    @staticmethod
+    def _delete_pages(conn: sqlite3.Connection, book_id: int):
+        # A book's pages occupy one rowid range, so removing them is a range delete, not a scan.
+        conn.execute("DELETE FROM pages WHERE rowid BETWEEN ? AND ?", (book_id << _PAGE_BITS, ((book_id + 1) << _PAGE_BITS) - 1))
+
+    def index_book(self, owner: str, book: str, file_path: str):
+        """(Re)indexes every page of a book from the page text cache."""
+        pages_num = (page_text_cache.get_artifact(file_path, "manifest") or {}).get("pages")
+        if pages_num is None:
+            pages_num = count_pages(file_path)
+        texts = []
+        for start in range(0, pages_num, 64):
+            batch = pages_to_text(file_path, list(range(start, min(start + 64, pages_num))))
+            texts.extend((page, text) for page, (text, _) in sorted(batch.items()) if text.strip())
+        conn = self._connection()
+        token = owner_token(owner)
+        with self._write_lock, conn:
+            # Checked under the write lock: a book deleted after this point is
+            # removed by its `remove_book`, which waits for this transaction.
+            if not self._book_exists(book):
+                logger.info("Not indexing %s: the book was deleted", book)
+                return
+            conn.execute("INSERT OR IGNORE INTO books (path) VALUES (?)", (book,))
+            book_id = conn.execute("SELECT id FROM books WHERE path = ?", (book,)).fetchone()[0]
+            self._delete_pages(conn, book_id)
+            conn.executemany(
+                "INSERT INTO pages (rowid, text, owner) VALUES (?, ?, ?)",
+                (((book_id << _PAGE_BITS) | page, text, token) for page, text in texts),
+            )
+        logger.info("Indexed %s pages of %s", len(texts), book)
+
+    def submit(self, owner: str, book: str, file_path: str):
+        """Indexes a book in the background."""
+        if not self.db_path:
+            return
+        def run():
+            try:
+                self.index_book(owner, book, file_path)
+            except Exception as e:
+                logger.error("Failed to index %s: %s", book, e)
+        self._executor.submit(run)
+
+    def remove_book(self, book: str):
+        if not self.db_path:
+            return
+        conn = self._connection()
+        with self._write_lock, conn:
+            row = conn.execute("SELECT id FROM books WHERE path = ?", (book,)).fetchone()
+            if row:
+                self._delete_pages(conn, row[0])
+                conn.execute("DELETE FROM books WHERE id = ?", row)
+
+    def search(self, owner: str, query: str, limit: int = 20, offset: int = 0) -> list[dict]:
+        match = match_query(owner, query)
+        if match is None:
+            return []
+        rows = self._connection().execute(
+            "SELECT books.path, hits.rowid, hits.snippet, hits.score FROM ("
+            "  SELECT rowid, snippet(pages, 0, '[', ']', '…', 16) AS snippet, bm25(pages, 1.0, 0.0) AS score"
+            "  FROM pages WHERE pages MATCH ? ORDER BY score LIMIT ? OFFSET ?"
+            ") AS hits JOIN books ON books.id = hits.rowid >> ? ORDER BY hits.score",
+            (match, limit, offset, _PAGE_BITS),
+        ).fetchall()
+        return [
+            {"path": path, "page": rowid & _PAGE_MASK, "snippet": snippet, "score": -score}
+            for path, rowid, snippet, score in rows
+        ]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+search_index = SearchIndex(SEARCH_INDEX_PATH)
+
+
+if __name__ == "__main__":
+    from db.database import SessionLocal, init_engines
+    from db.models import Book
+
+    logging.basicConfig(level=logging.INFO)
+    init_engines()
+    with SessionLocal() as db:
+        for book in db.query(Book).filter(Book.owner.isnot(None)):
+            try:
+                search_index.index_book(book.owner, book.path, book.file_path)
+            except Exception as e:
+                logger.error("Failed to index %s: %s", book.path, e)
@@ -0,0 +1,235 @@
+"""
+Key-value store for state that every worker process must see.
+
+Page text, covers and audio already live in files that all workers share;
+this store holds cached principals (so that updating or deleting a user
+takes effect in every worker), claims and failures that stop two workers
+from rendering the same cover, and the status of running ingestion jobs.
+Admission, hashing and pre-synthesis state is still per worker.
+SHARED_CACHE_URL selects the backend:
+
+- empty: in-process, for a single worker;
+- sqlite:///path/to/store.db: a SQLite file opened by every worker on the host;
+- redis://host:port/db: a Redis server, which needs the `redis` package.
+"""
+from const import SHARED_CACHE_URL
+from typing import Callable
+import logging
+import sqlite3
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStore:
+    shared = False
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+        return entry[0] if entry else None
+
+    def set(self, key: str, value: bytes, ttl: float | None = None):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+
+    def add(self, key: str, value: bytes, ttl: float | None = None) -> bool:
+        """Sets the key only if it is absent; True if it was set."""
+        now = time.monotonic()
+        with self._lock:
+            if self._live(key, now) is not None:
+                return False
+            self._entries[key] = (value, now + ttl if ttl else None)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self, prefix: str):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+
+class SqliteStore:
+    shared = True
+    # Expired rows are purged on every this many writes.
+    purge_every = 1000
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)")
+            self._local.conn = conn
+        return conn
+
+    def _wrote(self, conn: sqlite3.Connection):
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            conn.execute("DELETE FROM entries WHERE expires <= ?", (time.time(),))
+
+    def get(self, key: str) -> bytes | None:
+        row = self._connection().execute(
+            "SELECT value FROM entries WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: float | None = None):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl if ttl else None),
+        )
+        self._wrote(conn)
+
+    def add(self, key: str, value: bytes, ttl: float | None = None) -> bool:
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM entries WHERE key = ? AND expires <= ?", (key, now))
+            added = conn.execute(
+                "INSERT OR IGNORE INTO entries (key, value, expires) VALUES (?, ?, ?)",
+                (key, value, now + ttl if ttl else None),
+            ).rowcount == 1
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._wrote(conn)
+        return added
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self, prefix: str):
+        # A key range rather than LIKE, which would need escaping and can't use the index.
+        self._connection().execute("DELETE FROM entries WHERE key >= ? AND key < ?", (prefix, prefix + "\U0010ffff"))
+
+
+class RedisStore:
+    """Any client with the redis-py API works, e.g. fakeredis in tests."""
+
+    shared = True
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float | None = None):
+        self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key: str, value: bytes, ttl: float | None = None) -> bool:
+        return bool(self.client.set(key, value, px=int(ttl * 1000) if ttl else None, nx=True))
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+    def clear(self, prefix: str):
+        keys = list(self.client.scan_iter(match=f"{prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def open_store(url: str):
+    if not url:
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SqliteStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SHARED_CACHE_URL points at Redis but the redis package is not installed")
+        return RedisStore(redis.Redis.from_url(url))
+    raise ValueError(f"Unsupported SHARED_CACHE_URL: {url}")
+
+
+class SharedTTLCache:
+    """
+    The TTLCache interface over a store, so that every worker sees the same
+    entries and invalidations. Store errors count as misses.
+    """
+
+    def __init__(self, store, namespace: str, ttl: float, encode: Callable[[object], bytes], decode: Callable[[bytes], object]):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = ttl
+        self.encode = encode
+        self.decode = decode
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key, default=None):
+        try:
+            data = self.store.get(self.namespace + key)
+        except Exception as e:
+            logger.warning("Shared cache read failed: %s", e)
+            self._count("errors")
+            data = None
+        if data is None:
+            self._count("misses")
+            return default
+        self._count("hits")
+        return self.decode(data)
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        try:
+            self.store.set(self.namespace + key, self.encode(value), self.ttl)
+        except Exception as e:
+            logger.warning("Shared cache write failed: %s", e)
+            self._count("errors")
+
+    def pop(self, key):
+        # Invalidation must not be lost silently, so errors propagate here.
+        self.store.delete(self.namespace + key)
+
+    def clear(self):
+        self.store.clear(self.namespace)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self.store).__name__,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "errors": self.errors,
+                "ttl": self.ttl,
+            }
+
+
+shared_store = open_store(SHARED_CACHE_URL)
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from const import TEXT_CACHE_DIR, TEXT_CACHE_MAX_BYTES
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+
+def file_identity(path: str) -> tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class PageTextCache:
+    """
+    Two-level cache of extracted page text.
+
+    Entries are keyed by book path, file mtime/size and page number, so a
+    replaced file never serves stale text. The in-process LRU is bounded by
+    the UTF-8 size of the cached text; the on-disk store survives restarts.
+    """
+
+    def __init__(self, cache_dir: str | None, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _book_dir(self, path: str) -> str:
+        digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest)
+
+    def _version_dir(self, path: str, identity: tuple[int, int]) -> str:
+        mtime, size = identity
+        return os.path.join(self._book_dir(path), f"{mtime}-{size}")
+
+    def _page_name(self, page_num: int, source: str) -> str:
+        return f"{page_num}.txt" if source == "text" else f"{page_num}.{source}.txt"
+
+    def _create_version_dir(self, version_dir: str):
+        book_dir, version = os.path.split(version_dir)
+        os.makedirs(book_dir, exist_ok=True)
+        try:
+            os.mkdir(version_dir)
+        except FileExistsError:
+            # Another thread got here first and has already dropped the older versions.
+            return
+        # The file changed (or was never cached): drop the other versions only.
+        for entry in os.listdir(book_dir):
+            if entry != version:
+                shutil.rmtree(os.path.join(book_dir, entry), ignore_errors=True)
+
+    def _write(self, path: str, identity: tuple[int, int], name: str, data: str):
+        version_dir = self._version_dir(path, identity)
+        target = os.path.join(version_dir, name)
+        try:
+            if not os.path.isdir(version_dir):
+                self._create_version_dir(version_dir)
+            tmp_file = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_file, target)
+        except OSError:
+            pass
+
+    def _remember(self, key: tuple, text: str):
+        size = len(text.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (text, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def get(self, path: str, page_num: int, identity: tuple[int, int] | None = None, source: str = "text") -> str | None:
+        """`source` separates text layer extraction ("text") from other producers such as OCR."""
+        identity = identity or file_identity(path)
+        key = (os.path.abspath(path), *identity, page_num, source)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        if self.cache_dir:
+            try:
+                page_file = os.path.join(self._version_dir(path, identity), self._page_name(page_num, source))
+                with open(page_file, 'r', encoding='utf-8') as f:
+                    text = f.read()
+            except OSError:
+                pass
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, text)
+                return text
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, path: str, page_num: int, text: str, identity: tuple[int, int] | None = None, source: str = "text"):
+        identity = identity or file_identity(path)
+        self._remember((os.path.abspath(path), *identity, page_num, source), text)
+
+        if self.cache_dir:
+            self._write(path, identity, self._page_name(page_num, source), text)
+
+    def get_artifact(self, path: str, name: str, identity: tuple[int, int] | None = None):
+        """Load a JSON artifact stored next to the cached pages of a book."""
+        if not self.cache_dir:
+            return None
+        identity = identity or file_identity(path)
+        try:
+            with open(os.path.join(self._version_dir(path, identity), f"{name}.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put_artifact(self, path: str, name: str, data, identity: tuple[int, int] | None = None):
+        if self.cache_dir:
+            self._write(path, identity or file_identity(path), f"{name}.json", json.dumps(data))
+
+    def invalidate(self, path: str):
+        abs_path = os.path.abspath(path)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == abs_path]:
+                self._bytes -= self._entries.pop(key)[1]
+        if self.cache_dir:
+            shutil.rmtree(self._book_dir(path), ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+page_text_cache = PageTextCache(TEXT_CACHE_DIR, TEXT_CACHE_MAX_BYTES)
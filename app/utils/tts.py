@@ -0,0 +1,103 @@
+from abc import ABC, abstractmethod
+from typing import Iterator
+from fastapi import HTTPException
+from const import TTS_DEFAULT_ENGINE
+from .audio_cache import audio_cache, audio_key
+from .chunking import normalize_text
+import math
+import struct
+import zlib
+
+
+class TtsEngine(ABC):
+    """
+    A speech synthesizer. `synthesize` yields encoded audio as it is
+    produced, so the first bytes can reach the client before the whole
+    segment is done.
+    """
+
+    media_type = "audio/wav"
+    extension = ".wav"
+
+    @abstractmethod
+    def synthesize(self, text: str, voice: str, model_keys: dict | None = None) -> Iterator[bytes]:
+        ...
+
+
+class LocalEngine(TtsEngine):
+    """
+    Stand-in engine that needs no external service: each word becomes a short
+    tone whose pitch depends on the word and voice. Output is deterministic,
+    which makes it suitable for tests and benchmarks.
+    """
+
+    sample_rate = 16000
+    word_seconds = 0.2
+    pause_seconds = 0.05
+
+    def synthesize(self, text: str, voice: str, model_keys: dict | None = None) -> Iterator[bytes]:
+        words = normalize_text(text).split()
+        word_samples = int(self.sample_rate * self.word_seconds)
+        pause = bytes(2 * int(self.sample_rate * self.pause_seconds))
+        data_size = len(words) * (2 * word_samples + len(pause))
+        yield self._wav_header(data_size)
+        for word in words:
+            frequency = 200 + zlib.crc32(f"{voice}:{word}".encode()) % 400
+            step = 2 * math.pi * frequency / self.sample_rate
+            samples = (int(8000 * math.sin(step * i)) for i in range(word_samples))
+            yield struct.pack(f"<{word_samples}h", *samples) + pause
+
+    def _wav_header(self, data_size: int) -> bytes:
+        return struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF", 36 + data_size, b"WAVE",
+            b"fmt ", 16, 1, 1, self.sample_rate, 2 * self.sample_rate, 2, 16,
+            b"data", data_size,
+        )
+
+
+ENGINES: dict[str, TtsEngine] = {"local": LocalEngine()}
+
+def register_engine(name: str, engine: TtsEngine):
+    ENGINES[name] = engine
+
+# Books are created with this model name. It means the default engine
+# unless an engine is registered under that name.
+STANDARD_MODEL = "standard"
+
+def engine_name(model_name: str | None) -> str:
+    """The name of the registered engine a model name refers to; 400 for unknown names."""
+    if model_name in ENGINES:
+        return model_name
+    if model_name in (None, "", STANDARD_MODEL):
+        if TTS_DEFAULT_ENGINE not in ENGINES:
+            raise HTTPException(status_code=500, detail=f"No TTS engine registered as {TTS_DEFAULT_ENGINE}")
+        return TTS_DEFAULT_ENGINE
+    raise HTTPException(status_code=400, detail=f"Unknown TTS model: {model_name}")
+
+def get_engine(model_name: str | None) -> TtsEngine:
+    return ENGINES[engine_name(model_name)]
+
+def cached_audio(text: str, model_name: str, voice: str, model_keys: dict | None = None) -> tuple[str, str | None]:
+    """Content address of a segment and its cached audio file, if any."""
+    name = engine_name(model_name)
+    key = audio_key(text, name, voice, model_keys)
+    return key, audio_cache.get(key, ENGINES[name].extension)
+
+def synthesize(text: str, model_name: str, voice: str, model_keys: dict | None = None) -> Iterator[bytes]:
+    """Streams freshly synthesized audio, storing it in the audio cache once it is complete."""
+    name = engine_name(model_name)
+    engine = ENGINES[name]
+    writer = audio_cache.writer(audio_key(text, name, voice, model_keys), engine.extension)
+    try:
+        for data in engine.synthesize(text, voice, model_keys):
+            if writer:
+                writer.write(data)
+            yield data
+    except BaseException:
+        # Engine failure or the client went away: never cache partial audio.
+        if writer:
+            writer.abort()
+        raise
+    if writer:
+        writer.commit()
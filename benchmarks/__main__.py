@@ -0,0 +1,48 @@
+"""
+Runs the benchmark suite (utility micro-benchmarks and endpoint latencies)
+and writes one JSON document, tagged with the current commit:
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --quick --output results.json
+
+Compare two runs with `python -m benchmarks.compare base.json new.json`.
+"""
+import argparse
+import asyncio
+
+from . import endpoints, micro
+from .common import setup_environment, load_app, client, emit
+
+PRESETS = {
+    # repeat, crud books, books, pages, requests, logins, concurrency
+    "full": dict(repeat=20, crud_books=200, books=20, pages=30, requests=200, logins=32, concurrency=8),
+    "quick": dict(repeat=5, crud_books=50, books=5, pages=10, requests=50, logins=8, concurrency=4),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="smaller workloads, for a fast sanity check")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+    params = PRESETS["quick" if args.quick else "full"]
+
+    workdir = setup_environment()
+    app = load_app()
+
+    async def measure_endpoints():
+        async with client(app) as http:
+            return await endpoints.run(
+                http, params["books"], params["pages"], params["requests"], params["concurrency"], params["logins"],
+            )
+
+    results = {
+        "params": params,
+        "micro": micro.run(workdir, params["repeat"], params["crud_books"]),
+        "endpoints": asyncio.run(measure_endpoints()),
+    }
+    emit(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
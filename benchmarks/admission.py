@@ -0,0 +1,103 @@
+"""
+Page turns during an upload burst, with and without admission control.
+
+Several uploaders post large PDFs to /add_book while readers keep turning
+pages via /flip. The page text cache is disabled so every page turn parses
+its page. Reports the readers' latency, upload throughput and how many
+uploads were turned away with 429 or 503.
+
+    python -m benchmarks.admission --uploads 32 --uploaders 8 --readers 4
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from .common import setup_environment, load_app, client, register_and_login, summarize, emit
+from .synthetic import make_pdf
+
+PAGES = 50
+
+
+async def run(http, username: str, uploads: int, uploaders: int, readers: int, upload_pages: int) -> dict:
+    headers = await register_and_login(http, username)
+    response = await http.post(
+        "/add_book", headers=headers,
+        files={"pdf_file": ("reader.pdf", make_pdf(PAGES, words_per_page=600), "application/pdf")},
+    )
+    response.raise_for_status()
+    path = (await http.get("/books", headers=headers)).json()[0]["path"]
+    pdfs = [make_pdf(upload_pages, words_per_page=400, seed=i) for i in range(uploads)]
+
+    upload_latencies, flip_latencies, rejected = [], [], {}
+    pending = iter(range(uploads))
+    done = asyncio.Event()
+
+    async def uploader():
+        for i in pending:
+            start = time.perf_counter()
+            response = await http.post(
+                "/add_book", headers=headers,
+                files={"pdf_file": (f"{username}_{i}.pdf", pdfs[i], "application/pdf")},
+            )
+            if response.status_code in (429, 503):
+                rejected[response.status_code] = rejected.get(response.status_code, 0) + 1
+            else:
+                response.raise_for_status()
+                upload_latencies.append(time.perf_counter() - start)
+
+    async def reader(offset: int):
+        page = offset
+        while not done.is_set():
+            start = time.perf_counter()
+            response = await http.get("/flip", params={"path": path, "page_num": page % PAGES})
+            response.raise_for_status()
+            flip_latencies.append(time.perf_counter() - start)
+            page += readers
+
+    reader_tasks = [asyncio.create_task(reader(offset)) for offset in range(readers)]
+    start = time.perf_counter()
+    await asyncio.gather(*(uploader() for _ in range(uploaders)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await asyncio.gather(*reader_tasks)
+
+    return {
+        "upload": summarize(upload_latencies, elapsed),
+        "upload_rejected": rejected,
+        "flip_during_uploads": summarize(flip_latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=32)
+    parser.add_argument("--uploaders", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--upload-pages", type=int, default=200)
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    setup_environment()
+    # No page text cache: every /flip parses its page.
+    os.environ.update(TEXT_CACHE_DIR=os.path.join(os.devnull, "text_cache"), TEXT_CACHE_MAX_BYTES="0")
+    app = load_app()
+    import core.admission
+    from core.admission import AdmissionController
+
+    async def compare():
+        results = {"params": vars(args)}
+        configured = core.admission.admission
+        async with client(app) as http:
+            for mode, controller in (("off", AdmissionController(0, 0, 0, 0, 0, 0)), ("on", configured)):
+                core.admission.admission = controller
+                results[mode] = await run(
+                    http, f"bench_{mode}", args.uploads, args.uploaders, args.readers, args.upload_pages,
+                )
+                results[mode]["admission"] = controller.stats()
+        return results
+
+    emit(asyncio.run(compare()), args.output)
+
+
+if __name__ == "__main__":
+    main()
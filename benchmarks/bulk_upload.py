@@ -0,0 +1,87 @@
+"""
+Library import throughput: one /add_book request per file vs. /add_books.
+
+Uploads the same set of synthetic PDFs both ways and times each run until
+every book has been ingested, then removes them again with one /delete_book
+per book vs. a single /delete_books.
+
+    python -m benchmarks.bulk_upload --books 50 --pages 10
+"""
+import argparse
+import asyncio
+import time
+
+from .common import setup_environment, load_app, client, register_and_login, emit
+from .synthetic import make_pdf
+
+
+async def wait_ingested(http, paths: list[str]):
+    for path in paths:
+        while True:
+            response = await http.get("/ingest_status", params={"path": path})
+            if response.status_code == 200 and response.json()["status"] in ("done", "failed"):
+                break
+            await asyncio.sleep(0.01)
+
+async def run(http, username: str, pdfs: list[tuple[str, bytes]], bulk: bool, batch: int) -> dict:
+    headers = await register_and_login(http, username)
+    start = time.perf_counter()
+    if bulk:
+        for offset in range(0, len(pdfs), batch):
+            files = [("pdf_files", (name, data, "application/pdf")) for name, data in pdfs[offset:offset + batch]]
+            response = await http.post("/add_books", headers=headers, files=files)
+            response.raise_for_status()
+    else:
+        for name, data in pdfs:
+            response = await http.post("/add_book", headers=headers, files={"pdf_file": (name, data, "application/pdf")})
+            response.raise_for_status()
+    uploaded = time.perf_counter() - start
+    paths = [book["path"] for book in (await http.get("/books", headers=headers)).json()]
+    await wait_ingested(http, paths)
+    ingested = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if bulk:
+        for offset in range(0, len(paths), batch):
+            response = await http.post("/delete_books", headers=headers, json={"paths": paths[offset:offset + batch]})
+            response.raise_for_status()
+    else:
+        for path in paths:
+            response = await http.delete("/delete_book", headers=headers, params={"path": path})
+            response.raise_for_status()
+    deleted = time.perf_counter() - start
+
+    return {
+        "books": len(paths),
+        "upload_s": uploaded,
+        "ingested_s": ingested,
+        "books_per_s": len(paths) / ingested,
+        "delete_s": deleted,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=100, help="files per /add_books request")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    setup_environment()
+    app = load_app()
+
+    async def compare():
+        results = {"params": vars(args)}
+        async with client(app) as http:
+            for mode, bulk in (("single", False), ("bulk", True)):
+                # A distinct seed per mode keeps the second run from hitting the first one's blobs.
+                pdfs = [(f"book{i}.pdf", make_pdf(args.pages, seed=i * 2 + bulk)) for i in range(args.books)]
+                results[mode] = await run(http, f"bench_{mode}", pdfs, bulk, args.batch)
+        results["speedup"] = results["single"]["ingested_s"] / results["bulk"]["ingested_s"]
+        return results
+
+    emit(asyncio.run(compare()), args.output)
+
+
+if __name__ == "__main__":
+    main()
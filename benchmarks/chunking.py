@@ -0,0 +1,78 @@
+"""
+Sentence-aware chunking against the regex chunker it replaced.
+
+Both chunk the same synthetic text: punctuated prose laid out in lines as
+PDF extraction returns it, and the same words without any sentence end.
+Reports the latency of each and the longest chunk produced, which must not
+exceed the chunk size.
+
+    python -m benchmarks.chunking --sizes 1 4 10 --repeat 3
+"""
+import argparse
+import random
+import re
+
+from .common import setup_environment, summarize, timed, emit
+from .synthetic import WORDS, page_text
+
+
+def legacy_chunk_text(text: str, chunk_size: int = 300) -> list[str]:
+    """The chunker before utils/chunking.py: split after every terminator, then pack."""
+    sentences = re.split(r'(?<=[.!?]) +', text)
+    chunks = []
+    current_chunk = ""
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) + 1 <= chunk_size:
+            current_chunk = current_chunk + " " + sentence if current_chunk else sentence
+        else:
+            if current_chunk:
+                chunks.append(current_chunk)
+            current_chunk = sentence
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+def make_text(megabytes: float, punctuated: bool, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines, size = [], 0
+    while size < megabytes * 1_000_000:
+        if punctuated:
+            page = page_text(rng, 300)
+        else:
+            page = [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(25)]
+        lines.extend(page)
+        size += sum(len(line) + 1 for line in page)
+    return "\n".join(lines)
+
+def run(sizes: list[float], repeat: int, chunk_size: int) -> dict:
+    from utils.chunking import chunk_text, normalize_text
+
+    results = {}
+    for punctuated in (True, False):
+        for megabytes in sizes:
+            text = make_text(megabytes, punctuated)
+            entry = {}
+            # The old chunker was handed normalized text; its time includes that.
+            for name, chunker in (
+                ("legacy", lambda: legacy_chunk_text(normalize_text(text), chunk_size)),
+                ("chunk_text", lambda: chunk_text(text, chunk_size)),
+            ):
+                entry[name] = summarize(timed(chunker, repeat))
+                entry[name]["max_chunk_chars"] = max(map(len, chunker()), default=0)
+            results[f"{'punctuated' if punctuated else 'unpunctuated'}_{megabytes:g}mb"] = entry
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 10], help="text sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=300)
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    setup_environment()
+    emit({"params": vars(args), "chunking": run(args.sizes, args.repeat, args.chunk_size)}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Shared setup for the benchmarks: an isolated media directory and SQLite
+database, the app loaded in-process, and an ASGI client to drive it.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "app")
+
+
+def setup_environment(workdir: str = None) -> str:
+    """Point the app at a scratch directory. Must run before the app is imported."""
+    workdir = workdir or tempfile.mkdtemp(prefix="tts-bench-")
+    for sub in ("docs", "imgs"):
+        os.makedirs(os.path.join(workdir, "media", sub), exist_ok=True)
+    os.environ.update(
+        SECRET_KEY=os.environ.get("SECRET_KEY", "benchmark-secret"),
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        MEDIA_ASSETS=os.path.join(workdir, "media"),
+        DOC_PATH="/docs",
+        IMG_PATH="/imgs",
+    )
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    return workdir
+
+def load_app():
+    import main
+    from db.migrations import upgrade
+
+    upgrade()
+    return main.app
+
+def client(app):
+    import httpx
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None)
+
+async def register_and_login(http, username: str = "bench", password: str = "Bench!passw0rd") -> dict:
+    response = await http.post("/register", json={
+        "fullname": username, "email": f"{username}@example.com", "password": password, "username": username,
+    })
+    if response.status_code != 400:  # 400: already registered
+        response.raise_for_status()
+    response = await http.post("/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def summarize(samples: list[float], elapsed: float = None) -> dict:
+    """Latency percentiles in milliseconds (and throughput when `elapsed` is given)."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    result = {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": ordered[-1] * 1000,
+    }
+    if elapsed:
+        result["throughput_rps"] = len(samples) / elapsed
+    return result
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def timed(fn, repeat: int, setup=None) -> list[float]:
+    """Wall-clock seconds of `repeat` calls to `fn`; `setup` runs untimed before each call."""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def emit(results: dict, output: str = None):
+    results.setdefault("meta", {}).update(
+        commit=git_commit(),
+        python=sys.version.split()[0],
+        cpus=os.cpu_count(),
+        timestamp=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    )
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
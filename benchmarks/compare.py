@@ -0,0 +1,68 @@
+"""
+Compares two benchmark result files and flags regressions.
+
+Lists every latency (`*_ms`) and throughput (`*_rps`) figure present in both
+files with its relative change. Exits with status 1 if any p50 latency grew,
+or any throughput fell, by more than `--threshold`.
+
+    python -m benchmarks.compare base.json new.json --threshold 0.2
+"""
+import argparse
+import json
+import sys
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    figures = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            if key != "meta":
+                figures.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key.endswith(("_ms", "_rps")):
+            figures[name] = float(value)
+    return figures
+
+def compare(base: dict, new: dict, threshold: float) -> tuple[list[dict], list[str]]:
+    base_figures, new_figures = flatten(base), flatten(new)
+    rows, regressions = [], []
+    for name in sorted(base_figures.keys() & new_figures.keys()):
+        before, after = base_figures[name], new_figures[name]
+        change = (after - before) / before if before else 0.0
+        rows.append({"name": name, "base": before, "new": after, "change": change})
+        worse = change > threshold if name.endswith("p50_ms") else name.endswith("_rps") and change < -threshold
+        if worse:
+            regressions.append(name)
+    return rows, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    parser.add_argument("--json", action="store_true", help="print the comparison as JSON")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    rows, regressions = compare(base, new, args.threshold)
+
+    if args.json:
+        print(json.dumps({
+            "base": base.get("meta", {}).get("commit"),
+            "new": new.get("meta", {}).get("commit"),
+            "rows": rows,
+            "regressions": regressions,
+        }, indent=2))
+    else:
+        print(f"{base.get('meta', {}).get('commit')} -> {new.get('meta', {}).get('commit')}")
+        for row in rows:
+            flag = "  REGRESSION" if row["name"] in regressions else ""
+            print(f"{row['name']:<60} {row['base']:>12.3f} {row['new']:>12.3f} {row['change']:>+8.1%}{flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
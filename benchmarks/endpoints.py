@@ -0,0 +1,94 @@
+"""
+Latency and throughput of the main API endpoints.
+
+Builds a library of synthetic books through /add_book, then drives /flip,
+/get_pages_num, /books and /token with `--concurrency` clients each.
+/flip is measured twice over the same pages: first when no client has
+requested them yet (cold), then again (warm).
+
+    python -m benchmarks.endpoints --books 20 --requests 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from .common import setup_environment, load_app, client, register_and_login, summarize, emit
+from .synthetic import make_pdf
+
+USERNAME = "bench_endpoints"
+PASSWORD = "Bench!passw0rd"
+
+
+async def drive(requests: list, concurrency: int) -> dict:
+    """Issues the request thunks with `concurrency` concurrent clients and summarizes their latencies."""
+    pending = iter(requests)
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        for request in pending:
+            start = time.perf_counter()
+            response = await request()
+            if response.status_code >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, time.perf_counter() - start)
+    result["errors"] = errors
+    return result
+
+async def run(http, books: int, pages: int, requests: int, concurrency: int, logins: int) -> dict:
+    headers = await register_and_login(http, USERNAME, PASSWORD)
+    rng = random.Random(0)
+    results = {}
+
+    pdfs = [make_pdf(pages, words_per_page=rng.choice((100, 300, 900)), seed=i) for i in range(books)]
+    results["add_book"] = await drive([
+        lambda i=i: http.post("/add_book", headers=headers, files={"pdf_file": (f"book{i}.pdf", pdfs[i], "application/pdf")})
+        for i in range(books)
+    ], 1)
+    paths = [book["path"] for book in (await http.get("/books", headers=headers, params={"limit": books})).json()]
+
+    flips = [(rng.choice(paths), rng.randrange(pages)) for _ in range(requests)]
+    for phase in ("flip_cold", "flip_warm"):
+        results[phase] = await drive([
+            lambda path=path, page=page: http.get("/flip", params={"path": path, "page_num": page})
+            for path, page in flips
+        ], concurrency)
+    results["get_pages_num"] = await drive([
+        lambda: http.get("/get_pages_num", params={"path": rng.choice(paths)}) for _ in range(requests)
+    ], concurrency)
+    results["books"] = await drive([
+        lambda: http.get("/books", headers=headers) for _ in range(requests)
+    ], concurrency)
+    results["token"] = await drive([
+        lambda: http.post("/token", data={"username": USERNAME, "password": PASSWORD}) for _ in range(logins)
+    ], concurrency)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--logins", type=int, default=32, help="/token requests (bcrypt makes them slow)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    setup_environment()
+    app = load_app()
+
+    async def measure():
+        async with client(app) as http:
+            return await run(http, args.books, args.pages, args.requests, args.concurrency, args.logins)
+
+    emit({"params": vars(args), "endpoints": asyncio.run(measure())}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Login throughput with bcrypt inline on the event loop vs. on the hashing pool.
+
+Runs concurrent /token logins while a single reader keeps turning pages via
+/flip, and reports login throughput alongside the reader's latency.
+
+    python -m benchmarks.login_throughput --logins 64 --concurrency 16
+"""
+import argparse
+import asyncio
+import time
+
+from .common import setup_environment, load_app, client, register_and_login, summarize, emit
+from .synthetic import make_pdf
+
+
+async def run(http, username: str, logins: int, concurrency: int) -> dict:
+    headers = await register_and_login(http, username)
+    response = await http.post(
+        "/add_book", headers=headers,
+        files={"pdf_file": ("bench.pdf", make_pdf(20), "application/pdf")},
+    )
+    response.raise_for_status()
+    path = (await http.get("/books", headers=headers)).json()[0]["path"]
+
+    login_latencies, flip_latencies, rejected = [], [], 0
+    remaining = logins
+    done = asyncio.Event()
+
+    async def login_worker():
+        nonlocal remaining, rejected
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await http.post("/token", data={"username": username, "password": "Bench!passw0rd"})
+            if response.status_code == 503:
+                rejected += 1
+            else:
+                response.raise_for_status()
+                login_latencies.append(time.perf_counter() - start)
+
+    async def reader():
+        page = 0
+        while not done.is_set():
+            start = time.perf_counter()
+            response = await http.get("/flip", params={"path": path, "page_num": page % 20})
+            response.raise_for_status()
+            flip_latencies.append(time.perf_counter() - start)
+            page += 1
+            await asyncio.sleep(0.005)
+
+    reader_task = asyncio.create_task(reader())
+    start = time.perf_counter()
+    await asyncio.gather(*(login_worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await reader_task
+
+    return {
+        "login": summarize(login_latencies, elapsed),
+        "login_rejected": rejected,
+        "flip_during_logins": summarize(flip_latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    setup_environment()
+    app = load_app()
+    import core.security
+    from core.hashing import PasswordHasher
+
+    async def compare():
+        results = {"params": vars(args)}
+        pooled = core.security.password_hasher
+        async with client(app) as http:
+            for mode, hasher in (("inline", PasswordHasher(0, 0)), ("pool", pooled)):
+                core.security.password_hasher = hasher
+                results[mode] = await run(http, f"bench_{mode}", args.logins, args.concurrency)
+        return results
+
+    emit(asyncio.run(compare()), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Micro-benchmarks of the PDF utilities and the CRUD layer.
+
+Each utility runs against synthetic PDFs of several shapes: "cold" calls
+drop the page text cache and pooled reader first, "warm" calls hit them,
+and "parse" calls bypass both by reading from memory.
+
+    python -m benchmarks.micro --repeat 20
+"""
+import argparse
+import os
+import random
+from io import BytesIO
+
+from .common import setup_environment, summarize, timed, emit
+from .synthetic import make_pdf
+
+# name: (pages, words per page, page size)
+CORPUS = {
+    "short": (5, 150, (612, 792)),
+    "medium": (50, 300, (612, 792)),
+    "dense": (50, 1200, (612, 1584)),
+    "long": (300, 300, (612, 792)),
+}
+
+
+def write_corpus(directory: str, corpus: dict = CORPUS) -> dict[str, str]:
+    paths = {}
+    for name, (pages, words, page_size) in corpus.items():
+        paths[name] = os.path.join(directory, f"micro-{name}.pdf")
+        with open(paths[name], "wb") as f:
+            f.write(make_pdf(pages, words_per_page=words, page_size=page_size))
+    return paths
+
+def bench_pdf(path: str, pages: int, repeat: int) -> dict:
+    from fastapi import HTTPException
+    from utils.pdf_utils import pdf_to_text, count_pages, extract_metadata, chunk_text, normalize_text, first_page_jpeg
+    from utils.reader_pool import reader_pool
+    from utils.text_cache import page_text_cache
+    from const import INGEST_CHUNK_SIZE
+
+    rng = random.Random(0)
+    data = open(path, "rb").read()
+
+    def drop_caches():
+        page_text_cache.invalidate(path)
+        reader_pool.evict(path)
+
+    results = {
+        "bytes": len(data),
+        "pdf_to_text_parse": summarize(timed(lambda: pdf_to_text(BytesIO(data), rng.randrange(pages)), repeat)),
+        "pdf_to_text_cold": summarize(timed(lambda: pdf_to_text(path, rng.randrange(pages)), repeat, drop_caches)),
+    }
+    pdf_to_text(path, 0)
+    results["pdf_to_text_warm"] = summarize(timed(lambda: pdf_to_text(path, 0), repeat))
+    results["count_pages_cold"] = summarize(timed(lambda: count_pages(path), repeat, drop_caches))
+    results["count_pages_warm"] = summarize(timed(lambda: count_pages(path), repeat))
+    results["extract_metadata_cold"] = summarize(timed(lambda: extract_metadata(path), repeat, drop_caches))
+
+    text = pdf_to_text(path, 0)
+    results["normalize_text"] = summarize(timed(lambda: normalize_text(text), repeat))
+    results["chunk_text"] = summarize(timed(lambda: chunk_text(text, INGEST_CHUNK_SIZE), repeat))
+
+    try:
+        first_page_jpeg(path, dpi=72)
+    except HTTPException as e:
+        # Needs poppler; record why instead of failing the whole run.
+        results["first_page_jpeg"] = {"skipped": e.detail}
+    else:
+        results["first_page_jpeg"] = summarize(timed(lambda: first_page_jpeg(path, dpi=72), max(1, repeat // 4)))
+    return results
+
+def bench_crud(workdir: str, books: int, repeat: int) -> dict:
+    from db.crud import (
+        add_user, create_uploaded_books, delete_books, get_book_by_path, get_books_page,
+        get_existing_book_paths, stage_upload,
+    )
+    from db.database import SessionLocal, init_engines
+    from db.models import User
+
+    owner = "micro_crud"
+    paths = [f"/micro/{owner}/book{i}.pdf" for i in range(books)]
+    init_engines()
+    with SessionLocal() as db:
+        if db.get(User, owner) is None:
+            add_user(db, owner, f"{owner}@example.com", "unused", owner)
+        pending = iter(paths)
+        staged = []
+
+        def stage():
+            # Distinct content per book, so every upload links a new blob as a fresh upload would.
+            path = next(pending)
+            content = path.encode()
+            tmp_path, sha256 = stage_upload(BytesIO(content), workdir)
+            img_path = os.path.join(workdir, f"{sha256}.jpeg")
+            staged.append({
+                "path": path,
+                "metadata": {"/Title": "Micro", "img_path": img_path},
+                "sha256": sha256,
+                "tmp_path": tmp_path,
+                "blob_path": os.path.join(workdir, f"{sha256}.pdf"),
+                "img_path": img_path,
+                "size": len(content),
+            })
+
+        def create():
+            upload = staged.pop()
+            try:
+                create_uploaded_books(db, [upload], owner)
+            finally:
+                if os.path.exists(upload["tmp_path"]):
+                    os.unlink(upload["tmp_path"])
+
+        results = {"create_uploaded_books": summarize(timed(create, books, stage))}
+        results["get_book_by_path"] = summarize(timed(lambda: get_book_by_path(db, random.choice(paths)), repeat))
+        results["get_existing_book_paths"] = summarize(timed(lambda: get_existing_book_paths(db, paths), repeat))
+        results["get_books_page"] = summarize(timed(lambda: get_books_page(db, owner, limit=50), repeat))
+        results["delete_books"] = summarize(timed(lambda: delete_books(db, paths, owner=owner), 1))
+    return results
+
+def run(workdir: str, repeat: int, crud_books: int) -> dict:
+    paths = write_corpus(workdir)
+    results = {name: bench_pdf(paths[name], CORPUS[name][0], repeat) for name in CORPUS}
+    results["crud"] = bench_crud(workdir, crud_books, repeat)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--crud-books", type=int, default=200)
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    workdir = setup_environment()
+    from db.migrations import upgrade
+
+    upgrade()
+    emit({"params": vars(args), "micro": run(workdir, args.repeat, args.crud_books)}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Cold start: time from launching a server process until it answers.
+
+Each run starts uvicorn in a fresh interpreter and polls /token until a login
+succeeds (time to first request), then reads one page with /flip (time to
+first PDF request). Runs alternate between the default startup and
+WARM_UP=1. The import time of `main` is measured separately.
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from .common import APP_DIR, setup_environment, load_app, client, register_and_login, summarize, emit
+from .synthetic import make_pdf
+from .workers import free_port
+
+USERNAME = "bench_startup"
+PASSWORD = "Bench!passw0rd"
+
+
+async def prepare(app) -> str:
+    async with client(app) as http:
+        headers = await register_and_login(http, USERNAME, PASSWORD)
+        response = await http.post(
+            "/add_book", headers=headers,
+            files={"pdf_file": ("startup.pdf", make_pdf(5), "application/pdf")},
+        )
+        response.raise_for_status()
+        return (await http.get("/books", headers=headers)).json()[0]["path"]
+
+def import_time(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+async def cold_start(env: dict, path: str) -> dict:
+    import httpx
+
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as http:
+            while True:
+                try:
+                    response = await http.post("/token", data={"username": USERNAME, "password": PASSWORD})
+                    if response.status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None:
+                    raise RuntimeError("server exited during startup")
+                await asyncio.sleep(0.01)
+            first_request = time.perf_counter() - start
+            flip_start = time.perf_counter()
+            (await http.get("/flip", params={"path": path, "page_num": 1})).raise_for_status()
+            first_flip = time.perf_counter() - flip_start
+    finally:
+        server.terminate()
+        server.wait()
+    return {"first_request": first_request, "first_flip": first_flip}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    setup_environment()
+    path = asyncio.run(prepare(load_app()))
+    env = {**os.environ, "WARM_UP": "0"}
+
+    results = {"params": vars(args), "import_main": summarize([import_time(env) for _ in range(args.runs)])}
+    samples = {"default": [], "warm_up": []}
+    for _ in range(args.runs):
+        for mode, warm_up in (("default", "0"), ("warm_up", "1")):
+            samples[mode].append(asyncio.run(cold_start({**env, "WARM_UP": warm_up}, path)))
+    for mode, runs in samples.items():
+        results[mode] = {
+            "time_to_first_request": summarize([run["first_request"] for run in runs]),
+            "first_flip": summarize([run["first_flip"] for run in runs]),
+        }
+    emit(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
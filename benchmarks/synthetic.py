@@ -0,0 +1,71 @@
+"""
+Synthetic PDF generation for benchmarks.
+
+Writes minimal, valid PDFs with Helvetica text so that benchmarks don't
+depend on fixture files or on a PDF authoring library.
+"""
+import random
+
+WORDS = (
+    "the of and to in is was that for on as with by he at from his an were are which this be or "
+    "had not but what all when can said there use each she how their will other about out many "
+    "then them these so some her would make like him into time has look two more write go see "
+    "number way could people than first water been call who oil its now find long down day did"
+).split()
+
+
+def sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 18))]
+    return " ".join(words).capitalize() + rng.choice(".!?")
+
+def page_text(rng: random.Random, words_per_page: int) -> list[str]:
+    lines, line, count = [], [], 0
+    while count < words_per_page:
+        for word in sentence(rng).split():
+            line.append(word)
+            count += 1
+            if len(line) == 12:
+                lines.append(" ".join(line))
+                line = []
+    if line:
+        lines.append(" ".join(line))
+    return lines
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_pdf(pages: int, words_per_page: int = 300, seed: int = 0, page_size=(612, 792)) -> bytes:
+    rng = random.Random(seed)
+    width, height = page_size
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for _ in range(pages):
+        lines = page_text(rng, words_per_page)
+        content = ["BT /F1 10 Tf 12 TL 40 %d Td" % (height - 40)]
+        content += [f"({_escape(line)}) '" for line in lines]
+        content.append("ET")
+        stream = "\n".join(content).encode("latin-1")
+        page_id = len(objects) + 1
+        kids.append(f"{page_id} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
@@ -0,0 +1,119 @@
+"""
+Throughput of a CPU-heavy endpoint as gunicorn workers are added.
+
+Starts the app under gunicorn (gunicorn.conf.py) with 1, 2, ... workers and
+drives /flip over HTTP. The page text cache is disabled so every request
+extracts its page from the PDF, which is the CPU-bound path.
+
+    python -m benchmarks.workers --workers 1 2 4 --requests 400 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from .common import APP_DIR, setup_environment, register_and_login, summarize, emit
+from .synthetic import make_pdf
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workers: int, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+        cwd=APP_DIR,
+        env={**env, "WEB_CONCURRENCY": str(workers), "BIND": f"127.0.0.1:{port}"},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+async def wait_ready(http, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await http.get("/cache_stats")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+async def run(base_url: str, username: str, pages: int, requests: int, concurrency: int) -> dict:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as http:
+        await wait_ready(http)
+        headers = await register_and_login(http, username)
+        response = await http.post(
+            "/add_book", headers=headers,
+            files={"pdf_file": ("bench.pdf", make_pdf(pages, words_per_page=600), "application/pdf")},
+        )
+        response.raise_for_status()
+        path = (await http.get("/books", headers=headers)).json()[0]["path"]
+
+        rng = random.Random(0)
+        pending = iter(range(requests))
+        latencies, errors = [], 0
+
+        async def worker():
+            nonlocal errors
+            for _ in pending:
+                start = time.perf_counter()
+                response = await http.get("/flip", params={"path": path, "page_num": rng.randrange(pages)})
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        result = summarize(latencies, time.perf_counter() - start)
+        result["errors"] = errors
+        return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    workdir = setup_environment()
+    from db.migrations import upgrade
+
+    upgrade()
+    env = {
+        **os.environ,
+        # No page text cache: every /flip parses the page again.
+        "TEXT_CACHE_DIR": os.path.join(os.devnull, "text_cache"),
+        "TEXT_CACHE_MAX_BYTES": "0",
+        "SHARED_CACHE_URL": f"sqlite:///{os.path.join(workdir, 'shared_cache.db')}",
+    }
+    results = {"params": vars(args), "flip_uncached": {}}
+    for workers in args.workers:
+        port = free_port()
+        server = start_server(workers, port, env)
+        try:
+            results["flip_uncached"][str(workers)] = asyncio.run(
+                run(f"http://127.0.0.1:{port}", f"bench_w{workers}", args.pages, args.requests, args.concurrency)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+    baseline = results["flip_uncached"][str(args.workers[0])]["throughput_rps"]
+    results["scaling"] = {
+        workers: result["throughput_rps"] / baseline for workers, result in results["flip_uncached"].items()
+    }
+    emit(results, args.output)
+
+
+if __name__ == "__main__":
+    main()